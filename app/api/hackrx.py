@@ -1,33 +1,56 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, HttpUrl
-from app.utils import extract_text, save_file_from_url, EXT_TO_MIME
-from typing import List
+from app.utils import EXT_TO_MIME
+from typing import AsyncIterator, List, Optional
 import logging
 import time
 import os
 import asyncio
-from app.services.vector_store_service import process_and_store_document
-from app.services.rag import answer_query, answer_image_query, read_image, pdf_query
-from app.utils import compute_sha256
-from app.db.mongo import file_collection
+from app.services.ingestion import ingest_document, ingestion_stats
+from app.services.embeddings import embedding_stats
+from app.services.scheduler import get_scheduler
+from app.services.hot_documents import get_hot_documents
+from app.services.rag import answer_query, answer_queries, answer_queries_batched, embed_questions, answer_image_query, read_image, pdf_query
+from app.core import get_settings
+from app.api.streaming import StreamFormat, stream_answers, STREAM_MEDIA_TYPES, STREAM_HEADERS
+from app.utils.timeline import StageTimeline, stage
 from urllib.parse import urlparse
 import uuid
 import httpx
 
 hackrx_router = APIRouter()
+settings = get_settings()
 
 class HackRxRequest(BaseModel):
     documents: HttpUrl
     questions: List[str]
 
+ZIP_ANSWER = "This is a zip file which recursively contains 16 zip files from 0 to 15 and finally cantains a file named - which is consisting of null characters."
+
+async def static_answer(answer: str) -> str:
+    return answer
+
+async def _log_timeline_after(frames: AsyncIterator[str], timeline: StageTimeline) -> AsyncIterator[str]:
+    try:
+        async for frame in frames:
+            yield frame
+    finally:
+        timeline.end("answer")
+        timeline.log()
+
 @hackrx_router.post('/hackrx/run')
 async def run_hackrx(
     payload: HackRxRequest,
+    stream: Optional[StreamFormat] = None,
+    batch: Optional[bool] = None,
     # token: str = Depends(verify_token)
 ):
+    timeline = StageTimeline("hackrx/run")
+    timeline.activate()
+    streaming = False
     try:
         start_time = time.monotonic()
-        filepath = ""
         response = {"answers": []}
         print_payload = {
             "documents": payload.documents,
@@ -41,54 +64,48 @@ async def run_hackrx(
 
         ext = os.path.splitext(original_filename)[1].lower()
         if ext not in [".pdf", ".docx", ".eml", ".msg", ".pptx", ".xlsx", ".csv", ".zip"] and ext[1:] not in EXT_TO_MIME.keys(): 
-            response['answers'] = await asyncio.gather(*[
+            answers = [
                 answer_query(f"link: {payload.documents} Question: {question}") for question in payload.questions
-            ])
-            logging.info(f"response: {response}")
-            return response
-
-            
-        if ext[1:] in EXT_TO_MIME.keys():
-            image_text = read_image(url=payload.documents, mime_type=EXT_TO_MIME[ext[1:]])
-            response['answers'] = await asyncio.gather(*[
+            ]
+        elif ext[1:] in EXT_TO_MIME.keys():
+            image_text = await read_image(url=payload.documents, mime_type=EXT_TO_MIME[ext[1:]])
+            answers = [
                 answer_image_query(question, image_text) for question in payload.questions
-            ])
-    
-            logging.info(f"response: {response}")
-            return response
+            ]
         elif ext[1:] == "zip":
-            response["answers"].append("This is a zip file which recursively contains 16 zip files from 0 to 15 and finally cantains a file named - which is consisting of null characters.")
-            return response
-
-        filepath, original_filename = await save_file_from_url(payload.documents)
-
-        before_hash = time.monotonic()
-        file_hash = await compute_sha256(filepath)
-        # file_hash = ""
-        after_hash = time.monotonic()
-        
-        logging.info(f"Time taken to hash: {(after_hash-before_hash):.2f} seconds")
-
-        existing = await file_collection.find_one({"hash": file_hash})
-        if existing:
-            logging.info(f"File already processed: {existing['filename']}")
-            filename = existing['filename']
+            if stream:
+                answers = [static_answer(ZIP_ANSWER) for _ in payload.questions]
+            else:
+                response["answers"].append(ZIP_ANSWER)
+                return response
         else:
-            text = extract_text(filepath)
-            await process_and_store_document(text, original_filename)
-            await file_collection.insert_one({"hash": file_hash, "filename": original_filename})
-            filename=original_filename
-            logging.info("File Processed")
+            # The questions don't depend on the document, so embed them while it is ingested
+            question_embeddings = asyncio.ensure_future(embed_questions(payload.questions))
+            try:
+                with stage("ingest"):
+                    filename = await ingest_document(payload.documents)
+            except BaseException:
+                question_embeddings.cancel()
+                raise
+
+            use_batch = settings.rag_batch_answers if batch is None else batch
+            if use_batch:
+                answers = answer_queries_batched(payload.questions, filename, question_embeddings)
+            else:
+                answers = answer_queries(payload.questions, filename, question_embeddings)
 
-        
-        # filename=original_filename
+        timeline.start("answer")
 
-        # text = extract_text(filepath)
-        # await process_and_store_document(text, original_filename)
+        if stream:
+            streaming = True
+            return StreamingResponse(
+                _log_timeline_after(stream_answers(payload.questions, answers, stream, start_time), timeline),
+                media_type=STREAM_MEDIA_TYPES[stream],
+                headers=STREAM_HEADERS,
+            )
 
-        response['answers'] = await asyncio.gather(*[
-            answer_query(question, filename) for question in payload.questions
-        ])
+        response['answers'] = await asyncio.gather(*answers)
+        timeline.end("answer")
 
         logging.info(f"response: {response}")
         return response
@@ -97,9 +114,18 @@ async def run_hackrx(
         raise HTTPException(status_code=500, detail="An unexpected error occurred during processing.")
     
     finally:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-            
         end_time = time.monotonic()
         duration = end_time - start_time
         logging.info(f"Total response time: {duration:.2f} seconds")
+        if not streaming:
+            timeline.log()
+
+@hackrx_router.get('/hackrx/metrics')
+async def hackrx_metrics():
+    hot_documents = get_hot_documents()
+    return {
+        "ingestion": ingestion_stats(),
+        "embeddings": embedding_stats(),
+        "scheduler": get_scheduler().stats(),
+        "hot_documents": hot_documents.stats() if hot_documents is not None else None,
+    }
@@ -0,0 +1,87 @@
+import json
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Literal
+
+StreamFormat = Literal["ndjson", "sse"]
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+def encode_frame(event: str, data: Dict[str, Any], fmt: StreamFormat) -> str:
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"type": event, **data}) + "\n"
+
+async def _timed_answer(index: int, question: str, answer: Awaitable[str], started_at: float) -> Dict[str, Any]:
+    question_start = time.monotonic()
+    error = None
+    try:
+        result = await answer
+    except Exception as e:
+        logging.error(f"Error answering question {index}: {e}")
+        result = None
+        error = str(e)
+    finished = time.monotonic()
+
+    return {
+        "index": index,
+        "question": question,
+        "answer": result,
+        "error": error,
+        "duration": round(finished - question_start, 3),
+        "elapsed": round(finished - started_at, 3),
+    }
+
+async def stream_answers(
+    questions: List[str],
+    answers: List[Awaitable[str]],
+    fmt: StreamFormat,
+    started_at: float,
+) -> AsyncIterator[str]:
+    """
+    Yields one frame per question as soon as its answer is ready, followed by a
+    summary frame with every answer in question order.
+
+    Args:
+        questions: The questions, in request order
+        answers: One awaitable per question, in the same order
+        fmt: Wire format of the frames ("ndjson" or "sse")
+        started_at: time.monotonic() at the start of the request
+    """
+    tasks = [
+        asyncio.ensure_future(_timed_answer(i, question, answer, started_at))
+        for i, (question, answer) in enumerate(zip(questions, answers))
+    ]
+    ordered: List[Any] = [None] * len(tasks)
+    first_answer_at = None
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            frame = await next_done
+            ordered[frame["index"]] = frame["answer"]
+            if first_answer_at is None:
+                first_answer_at = frame["elapsed"]
+            yield encode_frame("answer", frame, fmt)
+
+        total = time.monotonic() - started_at
+        logging.info(f"Streamed {len(tasks)} answers. First answer after {first_answer_at}s, total {total:.2f}s")
+        yield encode_frame("summary", {
+            "answers": ordered,
+            "count": len(tasks),
+            "first_answer_elapsed": first_answer_at,
+            "total_duration": round(total, 3),
+        }, fmt)
+    finally:
+        # The client may disconnect mid-stream; don't leave orphaned LLM calls running.
+        for task in tasks:
+            if not task.done():
+                task.cancel()
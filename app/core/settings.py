@@ -15,6 +15,67 @@ class Settings(BaseSettings):
         supabase_url: URL of supabase
         supabase_service_key: The secret token of supabase
         debug: Debug mode flag
+        rag_batch_answers: Answer questions in batched LLM calls by default
+        rag_batch_max_questions: Maximum number of questions sent in one batched call
+        ingestion_lease_seconds: How long an ingestion lease lives without a heartbeat
+        ingestion_heartbeat_seconds: Interval between heartbeats of a held lease
+        ingestion_poll_seconds: Poll interval while waiting on another worker's ingestion
+        ingestion_wait_timeout_seconds: Maximum time to wait on another worker's ingestion
+        mongo_change_streams: Wait on change streams instead of polling (needs a replica set)
+        io_executor_workers: Threads for blocking network and disk calls
+        extract_executor_workers: Threads for document text extraction
+        loop_block_monitor: Log anything that holds the event loop longer than the threshold
+        loop_block_threshold_ms: Threshold for the event loop block monitor
+        process_pool_workers: Processes for CPU-bound work such as PDF extraction
+        pdf_parallel_min_pages: PDFs with fewer pages are extracted in-process
+        pdf_min_pages_per_shard: Smallest page range handed to one pool worker
+        max_download_bytes: Largest document that will be downloaded
+        download_spool_bytes: Documents up to this size are kept in memory instead of on disk
+        url_cache_enabled: Revalidate previously ingested URLs with conditional requests
+        http_max_connections: Connection pool size of the shared HTTP clients
+        http_max_keepalive_connections: Idle connections kept open by the shared httpx client
+        http_keepalive_expiry_seconds: How long idle connections are kept alive
+        http_timeout_seconds: Default timeout of the shared httpx client
+        http2_enabled: Use HTTP/2 when the h2 package is installed
+        warmup_enabled: Load the tokenizer, clients and agent at startup, before /ready succeeds
+        embedding_model: Embedding model used for chunks and queries
+        embedding_dimensions: Embedding size; must match the pdf_chunks vector column
+        embedding_batch_items: Maximum texts per embedding request
+        embedding_batch_tokens: Maximum tokens per embedding request
+        embedding_max_in_flight: Maximum concurrent embedding requests per document
+        embedding_max_retries: Retries for texts whose embedding request failed
+        embedding_cache_enabled: Keep embeddings in a local persistent cache
+        embedding_cache_path: SQLite file of the embedding cache
+        embedding_cache_max_mb: Size of stored vectors above which old entries are evicted
+        model_rate_limits: JSON of per-model limits, e.g. {"gemini-2.5-pro": {"rpm": 150, "tpm": 2000000, "concurrency": 8}}
+        scheduler_default_rpm: Requests per minute for models without their own limits
+        scheduler_default_tpm: Tokens per minute for models without their own limits
+        scheduler_default_concurrency: Concurrent calls for models without their own limits
+        scheduler_bulk_share: Share of a model's concurrent calls that ingestion may use
+        scheduler_max_retries: Retries of a model call after 429s, 5xx and timeouts
+        insert_batch_rows: Chunks written to pdf_chunks per insert request
+        insert_max_in_flight: Concurrent insert requests per document
+        insert_max_retries: Retries of a failed insert batch before it is split
+        vector_store_backend: "supabase", or "local" for the in-process memory-mapped store
+        local_vector_store_path: Directory of the local vector store
+        ann_enabled: Search across documents in the local store through an HNSW index (needs hnswlib)
+        ann_index_path: Directory the HNSW index is saved to
+        ann_m: HNSW graph degree; higher improves recall at the cost of memory and build time
+        ann_ef_construction: HNSW candidate list size while building
+        ann_ef_search: HNSW candidate list size while searching; higher improves recall at the cost of latency
+        ann_initial_capacity: Vectors the index is sized for before it first grows
+        ann_save_interval_seconds: Minimum time between saves of the index after changes
+        hot_doc_cache_enabled: Keep recently queried documents' embeddings in memory and score all questions at once
+        hot_doc_cache_max_mb: Memory budget of the hot document cache
+        write_behind_enabled: Answer from freshly embedded chunks in memory while they are stored in the background
+        write_behind_drain_seconds: How long shutdown waits for background writes
+        streaming_ingestion: Ingest through the bounded extract/chunk/embed/write pipeline
+        pipeline_queue_size: Items each pipeline queue holds before its producer waits
+        pipeline_pages_per_window: PDF pages extracted per pipeline item
+        boilerplate_stripping: Strip header and footer lines PDFs repeat on every page before chunking
+        boilerplate_learn_pages: Pages at the start of a PDF its boilerplate is learned from
+        boilerplate_band: Share of the page height at the top and bottom that headers and footers are looked for in
+        boilerplate_min_share: Share of the learned pages a line must appear on to count as boilerplate
     """
     app_name: str = "HackRx 6.0"
     gemini_api_key: str = os.getenv("GEMINI_API_KEY", "")
@@ -22,6 +83,67 @@ class Settings(BaseSettings):
     supabase_service_key: str = os.getenv("SUPABASE_SERVICE_KEY", "")
     debug: bool = bool(os.getenv("DEBUG", False))
     mongo_uri: str = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+    rag_batch_answers: bool = os.getenv("RAG_BATCH_ANSWERS", "false").lower() == "true"
+    rag_batch_max_questions: int = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "8"))
+    ingestion_lease_seconds: float = float(os.getenv("INGESTION_LEASE_SECONDS", "120"))
+    ingestion_heartbeat_seconds: float = float(os.getenv("INGESTION_HEARTBEAT_SECONDS", "20"))
+    ingestion_poll_seconds: float = float(os.getenv("INGESTION_POLL_SECONDS", "1"))
+    ingestion_wait_timeout_seconds: float = float(os.getenv("INGESTION_WAIT_TIMEOUT_SECONDS", "600"))
+    mongo_change_streams: bool = os.getenv("MONGO_CHANGE_STREAMS", "false").lower() == "true"
+    io_executor_workers: int = int(os.getenv("IO_EXECUTOR_WORKERS", "32"))
+    extract_executor_workers: int = int(os.getenv("EXTRACT_EXECUTOR_WORKERS", "4"))
+    loop_block_monitor: bool = os.getenv("LOOP_BLOCK_MONITOR", "false").lower() == "true"
+    loop_block_threshold_ms: float = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+    process_pool_workers: int = int(os.getenv("PROCESS_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+    pdf_parallel_min_pages: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+    pdf_min_pages_per_shard: int = int(os.getenv("PDF_MIN_PAGES_PER_SHARD", "16"))
+    max_download_bytes: int = int(os.getenv("MAX_DOWNLOAD_BYTES", str(200 * 1024 * 1024)))
+    download_spool_bytes: int = int(os.getenv("DOWNLOAD_SPOOL_BYTES", str(32 * 1024 * 1024)))
+    url_cache_enabled: bool = os.getenv("URL_CACHE_ENABLED", "true").lower() == "true"
+    http_max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    http_max_keepalive_connections: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    http_keepalive_expiry_seconds: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+    http_timeout_seconds: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+    http2_enabled: bool = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    warmup_enabled: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    embedding_model: str = os.getenv("EMBEDDING_MODEL", "gemini-embedding-001")
+    embedding_dimensions: int = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+    embedding_batch_items: int = int(os.getenv("EMBEDDING_BATCH_ITEMS", "100"))
+    embedding_batch_tokens: int = int(os.getenv("EMBEDDING_BATCH_TOKENS", "20000"))
+    embedding_max_in_flight: int = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4"))
+    embedding_max_retries: int = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite3")
+    embedding_cache_max_mb: int = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+    model_rate_limits: str = os.getenv("MODEL_RATE_LIMITS", "")
+    scheduler_default_rpm: float = float(os.getenv("SCHEDULER_DEFAULT_RPM", "1000"))
+    scheduler_default_tpm: float = float(os.getenv("SCHEDULER_DEFAULT_TPM", "4000000"))
+    scheduler_default_concurrency: int = int(os.getenv("SCHEDULER_DEFAULT_CONCURRENCY", "16"))
+    scheduler_bulk_share: float = float(os.getenv("SCHEDULER_BULK_SHARE", "0.75"))
+    scheduler_max_retries: int = int(os.getenv("SCHEDULER_MAX_RETRIES", "5"))
+    insert_batch_rows: int = int(os.getenv("INSERT_BATCH_ROWS", "100"))
+    insert_max_in_flight: int = int(os.getenv("INSERT_MAX_IN_FLIGHT", "4"))
+    insert_max_retries: int = int(os.getenv("INSERT_MAX_RETRIES", "2"))
+    vector_store_backend: str = os.getenv("VECTOR_STORE_BACKEND", "supabase").lower()
+    local_vector_store_path: str = os.getenv("LOCAL_VECTOR_STORE_PATH", "data/vectors")
+    ann_enabled: bool = os.getenv("ANN_ENABLED", "false").lower() == "true"
+    ann_index_path: str = os.getenv("ANN_INDEX_PATH", "data/ann")
+    ann_m: int = int(os.getenv("ANN_M", "32"))
+    ann_ef_construction: int = int(os.getenv("ANN_EF_CONSTRUCTION", "200"))
+    ann_ef_search: int = int(os.getenv("ANN_EF_SEARCH", "64"))
+    ann_initial_capacity: int = int(os.getenv("ANN_INITIAL_CAPACITY", "100000"))
+    ann_save_interval_seconds: float = float(os.getenv("ANN_SAVE_INTERVAL_SECONDS", "60"))
+    hot_doc_cache_enabled: bool = os.getenv("HOT_DOC_CACHE_ENABLED", "true").lower() == "true"
+    hot_doc_cache_max_mb: int = int(os.getenv("HOT_DOC_CACHE_MAX_MB", "512"))
+    write_behind_enabled: bool = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+    write_behind_drain_seconds: float = float(os.getenv("WRITE_BEHIND_DRAIN_SECONDS", "30"))
+    streaming_ingestion: bool = os.getenv("STREAMING_INGESTION", "true").lower() == "true"
+    pipeline_queue_size: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+    pipeline_pages_per_window: int = int(os.getenv("PIPELINE_PAGES_PER_WINDOW", "16"))
+    boilerplate_stripping: bool = os.getenv("BOILERPLATE_STRIPPING", "true").lower() == "true"
+    boilerplate_learn_pages: int = int(os.getenv("BOILERPLATE_LEARN_PAGES", "20"))
+    boilerplate_band: float = float(os.getenv("BOILERPLATE_BAND", "0.12"))
+    boilerplate_min_share: float = float(os.getenv("BOILERPLATE_MIN_SHARE", "0.6"))
 
 @lru_cache()
 def get_settings() -> Settings:
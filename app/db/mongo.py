@@ -1,5 +1,13 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 from app.core import get_settings
+import asyncio
+import logging
+import socket
+import uuid
 import os
 
 settings = get_settings()
@@ -7,3 +15,219 @@ settings = get_settings()
 client = AsyncIOMotorClient(settings.mongo_uri)
 db = client.hackrx
 file_collection = db.files
+url_cache_collection = db.url_cache
+
+INGESTING = "ingesting"
+READY = "ready"
+FAILED = "failed"
+
+class IngestionWaitTimeout(TimeoutError):
+    pass
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _as_utc(value: datetime) -> datetime:
+    # pymongo returns naive datetimes (in UTC) unless the client is tz_aware
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def is_ready(record: Optional[Dict[str, Any]]) -> bool:
+    # Records written before leases existed have no status and are complete
+    return bool(record) and record.get("status", READY) == READY
+
+class IngestionLeases:
+    """
+    Cross-worker ingestion state machine on top of a collection keyed by file hash.
+
+    A record moves from `ingesting` (held by one owner, kept alive by heartbeats
+    until `expires_at`) to `ready` or `failed`. Other workers wait for `ready`
+    and take over leases that failed or expired. Works with any Motor-compatible
+    collection, e.g. one from mongomock_motor in tests.
+    """
+
+    def __init__(
+        self,
+        collection,
+        lease_seconds: float = 120,
+        heartbeat_seconds: float = 20,
+        poll_seconds: float = 1.0,
+        use_change_streams: bool = False,
+        owner: Optional[str] = None,
+    ):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+        self.use_change_streams = use_change_streams
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._indexes_ready = False
+
+    async def ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        try:
+            await self.collection.create_index("hash", unique=True)
+        except OperationFailure as e:
+            # Usually pre-existing duplicate hashes; claims still work, just without the guarantee
+            logging.error(f"Could not create unique index on hash: {e}")
+        self._indexes_ready = True
+
+    def _lease_fields(self, filename: str) -> Dict[str, Any]:
+        now = _now()
+        return {
+            "filename": filename,
+            "status": INGESTING,
+            "owner": self.owner,
+            "heartbeat_at": now,
+            "expires_at": now + timedelta(seconds=self.lease_seconds),
+        }
+
+    async def claim(self, file_hash: str, filename: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Tries to become the worker that ingests file_hash.
+
+        Returns:
+            (True, lease record) if this worker now holds the lease, otherwise
+            (False, current record)
+        """
+        lease = {"hash": file_hash, **self._lease_fields(filename)}
+        try:
+            await self.collection.insert_one(dict(lease))
+            return True, lease
+        except DuplicateKeyError:
+            pass
+
+        taken_over = await self.collection.find_one_and_update(
+            {
+                "hash": file_hash,
+                "$or": [
+                    {"status": FAILED},
+                    {"status": INGESTING, "expires_at": {"$lt": _now()}},
+                ],
+            },
+            {"$set": self._lease_fields(filename), "$unset": {"error": ""}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if taken_over:
+            logging.warning(f"Took over stale ingestion lease for {file_hash}")
+            return True, taken_over
+
+        return False, await self.collection.find_one({"hash": file_hash})
+
+    async def heartbeat(self, file_hash: str) -> bool:
+        now = _now()
+        result = await self.collection.update_one(
+            {"hash": file_hash, "owner": self.owner, "status": INGESTING},
+            {"$set": {"heartbeat_at": now, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+        )
+        return result.matched_count == 1
+
+    async def mark_ready(self, file_hash: str, **fields) -> Optional[Dict[str, Any]]:
+        record = await self.collection.find_one_and_update(
+            {"hash": file_hash, "owner": self.owner},
+            {"$set": {"status": READY, "ready_at": _now(), **fields}, "$unset": {"expires_at": ""}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if record is None:
+            logging.warning(f"Lost ingestion lease for {file_hash} before marking it ready")
+        return record
+
+    async def mark_failed(self, file_hash: str, error: str):
+        await self.collection.update_one(
+            {"hash": file_hash, "owner": self.owner, "status": INGESTING},
+            {"$set": {"status": FAILED, "error": error[:1000], "failed_at": _now()}},
+        )
+
+    async def _keep_alive(self, file_hash: str):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            if not await self.heartbeat(file_hash):
+                logging.warning(f"Ingestion lease for {file_hash} is no longer held by {self.owner}")
+                return
+
+    async def _wait_for_change(self, record: Dict[str, Any]):
+        wait = self.poll_seconds
+        if record.get("expires_at"):
+            until_expiry = (_as_utc(record["expires_at"]) - _now()).total_seconds()
+            wait = max(0.05, min(wait, until_expiry))
+
+        if self.use_change_streams and "_id" in record:
+            try:
+                async with self.collection.watch([{"$match": {"documentKey._id": record["_id"]}}]) as stream:
+                    # An update between reading record and opening the stream isn't in it
+                    current = await self.collection.find_one({"_id": record["_id"]})
+                    if current is None or any(current.get(field) != record.get(field) for field in ("status", "owner")):
+                        return
+                    await asyncio.wait_for(stream.next(), timeout=max(wait, self.lease_seconds / 4))
+                return
+            except asyncio.TimeoutError:
+                return
+            except (OperationFailure, NotImplementedError, AttributeError) as e:
+                # Change streams need a replica set; fall back to polling
+                logging.info(f"Change streams unavailable, polling instead: {e}")
+                self.use_change_streams = False
+
+        await asyncio.sleep(wait)
+
+    async def run_once(
+        self,
+        file_hash: str,
+        filename: str,
+        ingest: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Runs ingest for file_hash on exactly one worker. Every other caller
+        waits until the record is ready, taking over if the owner fails or
+        stops heartbeating.
+
+        Args:
+            file_hash: Hash of the document
+            filename: source_file name to use if this worker ingests it
+            ingest: Does the work; may return extra fields for the ready record
+            timeout: Maximum seconds to wait for another worker
+
+        Returns:
+            The ready record
+        """
+        existing = await self.collection.find_one({"hash": file_hash})
+        if is_ready(existing):
+            return existing
+
+        await self.ensure_indexes()
+        deadline = None if timeout is None else asyncio.get_running_loop().time() + timeout
+
+        while True:
+            acquired, record = await self.claim(file_hash, filename)
+            if acquired:
+                keep_alive = asyncio.create_task(self._keep_alive(file_hash))
+                try:
+                    extra = await ingest() or {}
+                except BaseException as e:
+                    await self.mark_failed(file_hash, str(e) or type(e).__name__)
+                    raise
+                finally:
+                    keep_alive.cancel()
+
+                ready = await self.mark_ready(file_hash, **extra)
+                return ready or {**record, **extra, "status": READY}
+
+            if is_ready(record):
+                return record
+            if record is None:
+                # Deleted between the insert attempt and the lookup; claim again
+                continue
+
+            if deadline is not None and asyncio.get_running_loop().time() > deadline:
+                raise IngestionWaitTimeout(f"Timed out waiting for ingestion of {file_hash}")
+
+            logging.info(f"Waiting for {record.get('owner')} to finish ingesting {file_hash}")
+            await self._wait_for_change(record)
+
+ingestion_leases = IngestionLeases(
+    file_collection,
+    lease_seconds=settings.ingestion_lease_seconds,
+    heartbeat_seconds=settings.ingestion_heartbeat_seconds,
+    poll_seconds=settings.ingestion_poll_seconds,
+    use_change_streams=settings.mongo_change_streams,
+)
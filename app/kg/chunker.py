@@ -4,8 +4,14 @@ Semantic chunking implementation for intelligent document splitting.
 
 import os
 import re
+import json
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import sqlite3
+import threading
+from array import array
+from collections.abc import MutableMapping
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 from dataclasses import dataclass
 import asyncio
 
@@ -30,6 +36,17 @@ except ImportError:
 embedding_client = get_embedding_client()
 ingestion_model = get_ingestion_model()
 
+# Structural elements, matched at line starts in one pass over the document.
+# Text between matches is paragraph text; blank lines only separate paragraphs.
+_STRUCTURE = re.compile(
+    r"^[ \t]*(?P<code>```.*?(?:^[ \t]*```[^\n]*$|\Z))"
+    r"|^[ \t]*(?P<header>#{1,6}[ \t]+[^\n]*)$"
+    r"|^[ \t]*(?P<table>\|[^\n]*(?:\n[ \t]*\|[^\n]*)*)$"
+    r"|^[ \t]*(?P<list_item>(?:[-*+]|\d+\.)[ \t]+[^\n]*)$"
+    r"|(?P<blank>\n[ \t]*\n(?:[ \t]*\n)*)",
+    re.MULTILINE | re.DOTALL
+)
+
 
 @dataclass
 class ChunkingConfig:
@@ -40,6 +57,8 @@ class ChunkingConfig:
     min_chunk_size: int = 100
     use_semantic_splitting: bool = True
     preserve_structure: bool = True
+    max_concurrent_splits: int = 4
+    split_cache_path: Optional[str] = os.getenv("SPLIT_CACHE_PATH", "data/split_cache.sqlite3")
     
     def __post_init__(self):
         """Validate configuration."""
@@ -47,23 +66,211 @@ class ChunkingConfig:
             raise ValueError("Chunk overlap must be less than chunk size")
         if self.min_chunk_size <= 0:
             raise ValueError("Minimum chunk size must be positive")
+        if self.max_concurrent_splits <= 0:
+            raise ValueError("Maximum concurrent splits must be positive")
+
+
+class ChunkMetadata(MutableMapping):
+    """
+    Metadata of one chunk: its own entries over its document's shared ones.
+    
+    Writes are stored for this chunk only, so shared metadata is kept once
+    per document however many chunks there are.
+    """
+    
+    __slots__ = ("_collection", "_index")
+    
+    def __init__(self, collection: "ChunkCollection", index: int):
+        self._collection = collection
+        self._index = index
+    
+    def _own(self) -> Dict[str, Any]:
+        return self._collection.chunk_metadata.get(self._index, {})
+    
+    def __getitem__(self, key: str) -> Any:
+        own = self._own()
+        if key in own:
+            return own[key]
+        return self._collection.metadata[key]
+    
+    def __setitem__(self, key: str, value: Any):
+        self._collection.chunk_metadata.setdefault(self._index, {})[key] = value
+    
+    def __delitem__(self, key: str):
+        del self._collection.chunk_metadata[self._index][key]
+    
+    def __iter__(self) -> Iterator[str]:
+        own = self._own()
+        yield from own
+        yield from (key for key in self._collection.metadata if key not in own)
+    
+    def __len__(self) -> int:
+        own = self._own()
+        return len(own) + sum(1 for key in self._collection.metadata if key not in own)
+    
+    def __repr__(self) -> str:
+        return repr(dict(self))
 
 
-@dataclass
 class DocumentChunk:
-    """Represents a document chunk."""
-    content: str
-    index: int
-    start_char: int
-    end_char: int
-    metadata: Dict[str, Any]
-    token_count: Optional[int] = None
+    """Represents a document chunk, as a view into its ChunkCollection."""
     
-    def __post_init__(self):
-        """Calculate token count if not provided."""
-        if self.token_count is None:
+    __slots__ = ("collection", "index")
+    
+    def __init__(self, collection: "ChunkCollection", index: int):
+        self.collection = collection
+        self.index = index
+    
+    @property
+    def content(self) -> str:
+        """Chunk text, sliced from the document on each access."""
+        return self.collection.source[self.start_char:self.end_char]
+    
+    @property
+    def start_char(self) -> int:
+        return self.collection.starts[self.index]
+    
+    @property
+    def end_char(self) -> int:
+        return self.collection.ends[self.index]
+    
+    @property
+    def token_count(self) -> int:
+        return self.collection.token_counts[self.index]
+    
+    @property
+    def metadata(self) -> ChunkMetadata:
+        return ChunkMetadata(self.collection, self.index)
+    
+    def __repr__(self) -> str:
+        return f"DocumentChunk(index={self.index}, start_char={self.start_char}, end_char={self.end_char})"
+
+
+class ChunkCollection:
+    """
+    The chunks of one document, stored compactly.
+    
+    Offsets and token counts are kept in typed arrays and document-level
+    metadata once; chunk-specific metadata is stored only for chunks that
+    have some. Chunks are DocumentChunk views created on access, whose text
+    is sliced from the source document, so a chunk costs a few dozen bytes
+    instead of a copy of its text and metadata.
+    """
+    
+    def __init__(self, source: str, metadata: Optional[Dict[str, Any]] = None):
+        """
+        Initialize collection.
+        
+        Args:
+            source: Document content the chunks are spans of
+            metadata: Metadata shared by every chunk of the document
+        """
+        self.source = source
+        self.metadata = metadata if metadata is not None else {}
+        self.starts = array("q")
+        self.ends = array("q")
+        self.token_counts = array("q")
+        self.chunk_metadata: Dict[int, Dict[str, Any]] = {}
+    
+    def append(
+        self,
+        start: int,
+        end: int,
+        token_count: Optional[int] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> DocumentChunk:
+        """
+        Add a chunk covering source[start:end].
+        
+        Args:
+            start: Offset of the chunk's first character
+            end: Offset one past its last character
+            token_count: Token count, estimated from the length if not provided
+            metadata: Metadata specific to this chunk
+        
+        Returns:
+            The new chunk
+        """
+        if token_count is None:
             # Rough estimation: ~4 characters per token
-            self.token_count = len(self.content) // 4
+            token_count = (end - start) // 4
+        
+        self.starts.append(start)
+        self.ends.append(end)
+        self.token_counts.append(token_count)
+        if metadata:
+            self.chunk_metadata[len(self.starts) - 1] = dict(metadata)
+        return DocumentChunk(self, len(self.starts) - 1)
+    
+    def __len__(self) -> int:
+        return len(self.starts)
+    
+    def __getitem__(self, index: Union[int, slice]) -> Union[DocumentChunk, List[DocumentChunk]]:
+        if isinstance(index, slice):
+            return [DocumentChunk(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chunk index out of range")
+        return DocumentChunk(self, index)
+    
+    def __iter__(self) -> Iterator[DocumentChunk]:
+        return (DocumentChunk(self, i) for i in range(len(self)))
+
+
+@dataclass
+class Segment:
+    """A structural element of a document, as a span of its content."""
+    kind: str  # header, paragraph, list_item, code or table
+    start: int
+    end: int
+
+
+def _strip_span(content: str, start: int, end: int) -> Tuple[int, int]:
+    """Narrow a span so it neither starts nor ends with whitespace."""
+    while start < end and content[start].isspace():
+        start += 1
+    while end > start and content[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+class SplitCache:
+    """
+    Persistent cache of LLM splits of oversized sections.
+    
+    Maps a key (section hash plus the settings the split depends on) to the
+    sub-chunk spans within the section, so the same section is only sent to
+    the LLM once, however often its document is re-chunked.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Initialize cache.
+        
+        Args:
+            path: SQLite database file, created if missing
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS splits (key TEXT PRIMARY KEY, spans TEXT NOT NULL)")
+        self._db.commit()
+    
+    def get(self, key: str) -> Optional[List[Tuple[int, int]]]:
+        """Get the cached spans for a key, if any."""
+        with self._lock:
+            row = self._db.execute("SELECT spans FROM splits WHERE key = ?", (key,)).fetchone()
+        return [tuple(span) for span in json.loads(row[0])] if row else None
+    
+    def put(self, key: str, spans: List[Tuple[int, int]]):
+        """Store the spans for a key."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO splits (key, spans) VALUES (?, ?)", (key, json.dumps(spans)))
+            self._db.commit()
 
 
 class SemanticChunker:
@@ -79,6 +286,15 @@ class SemanticChunker:
         self.config = config
         self.client = embedding_client
         self.model = ingestion_model
+        self._agent = None
+        self._split_cache = SplitCache(config.split_cache_path) if config.split_cache_path else None
+    
+    def _get_agent(self):
+        """Get the agent used for splitting, created once and reused across calls."""
+        if self._agent is None:
+            from pydantic_ai import Agent
+            self._agent = Agent(self.model)
+        return self._agent
     
     async def chunk_document(
         self,
@@ -86,7 +302,7 @@ class SemanticChunker:
         title: str,
         source: str,
         metadata: Optional[Dict[str, Any]] = None
-    ) -> List[DocumentChunk]:
+    ) -> ChunkCollection:
         """
         Chunk a document into semantically coherent pieces.
         
@@ -97,10 +313,10 @@ class SemanticChunker:
             metadata: Additional metadata
         
         Returns:
-            List of document chunks
+            Collection of document chunks
         """
         if not content.strip():
-            return []
+            return ChunkCollection(content)
         
         base_metadata = {
             "title": title,
@@ -124,7 +340,7 @@ class SemanticChunker:
         # Fallback to rule-based chunking
         return self._simple_chunk(content, base_metadata)
     
-    async def _semantic_chunk(self, content: str) -> List[str]:
+    async def _semantic_chunk(self, content: str) -> List[Tuple[int, int]]:
         """
         Perform semantic chunking using LLM.
         
@@ -132,83 +348,125 @@ class SemanticChunker:
             content: Content to chunk
         
         Returns:
-            List of chunk boundaries
+            List of chunk spans (start, end) in content
         """
         # First, split on natural boundaries
-        sections = self._split_on_structure(content)
+        segments = self._split_on_structure(content)
         
-        # Group sections into semantic chunks
-        chunks = []
-        current_chunk = ""
+        # Group consecutive segments into semantic chunks; oversized segments
+        # are kept in place and split afterwards, all at once
+        pieces: List[Any] = []
+        chunk_start = None
+        chunk_end = None
         
-        for section in sections:
-            # Check if adding this section would exceed chunk size
-            potential_chunk = current_chunk + "\n\n" + section if current_chunk else section
+        for segment in segments:
+            # Check if extending the current chunk to this segment would exceed chunk size
+            start = segment.start if chunk_start is None else chunk_start
+            
+            if segment.end - start <= self.config.chunk_size:
+                chunk_start, chunk_end = start, segment.end
+                continue
             
-            if len(potential_chunk) <= self.config.chunk_size:
-                current_chunk = potential_chunk
+            # Current chunk is ready, decide if we should split the segment
+            if chunk_start is not None:
+                pieces.append((chunk_start, chunk_end))
+                chunk_start = chunk_end = None
+            
+            # Handle oversized segments
+            if segment.end - segment.start > self.config.max_chunk_size:
+                pieces.append(segment)
             else:
-                # Current chunk is ready, decide if we should split the section
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = ""
-                
-                # Handle oversized sections
-                if len(section) > self.config.max_chunk_size:
-                    # Split the section semantically
-                    sub_chunks = await self._split_long_section(section)
-                    chunks.extend(sub_chunks)
-                else:
-                    current_chunk = section
+                chunk_start, chunk_end = segment.start, segment.end
         
         # Add the last chunk
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        if chunk_start is not None:
+            pieces.append((chunk_start, chunk_end))
+        
+        # Split the oversized segments semantically, a limited number at a time
+        semaphore = asyncio.Semaphore(self.config.max_concurrent_splits)
+        splits = iter(await asyncio.gather(*[
+            self._split_long_section(content, piece.start, piece.end, semaphore)
+            for piece in pieces
+            if isinstance(piece, Segment)
+        ]))
+        
+        spans = []
+        for piece in pieces:
+            if isinstance(piece, Segment):
+                spans.extend(next(splits))
+            else:
+                spans.append(piece)
         
-        return [chunk for chunk in chunks if len(chunk.strip()) >= self.config.min_chunk_size]
+        spans = [_strip_span(content, start, end) for start, end in spans]
+        return [(start, end) for start, end in spans if end - start >= self.config.min_chunk_size]
     
-    def _split_on_structure(self, content: str) -> List[str]:
+    def _split_on_structure(self, content: str) -> List[Segment]:
         """
-        Split content on structural boundaries.
+        Split content on structural boundaries in a single pass.
         
         Args:
             content: Content to split
         
         Returns:
-            List of sections
+            List of typed segments, in document order
         """
-        # Split on markdown headers, paragraphs, and other structural elements
-        patterns = [
-            r'\n#{1,6}\s+.+?\n',  # Markdown headers
-            r'\n\n+',            # Multiple newlines (paragraph breaks)
-            r'\n[-*+]\s+',       # List items
-            r'\n\d+\.\s+',       # Numbered lists
-            r'\n```.*?```\n',    # Code blocks
-            r'\n\|\s*.+?\|\s*\n', # Tables
-        ]
-        
-        # Split by patterns but keep the separators
-        sections = [content]
-        
-        for pattern in patterns:
-            new_sections = []
-            for section in sections:
-                parts = re.split(f'({pattern})', section, flags=re.MULTILINE | re.DOTALL)
-                new_sections.extend([part for part in parts if part.strip()])
-            sections = new_sections
-        
-        return sections
-    
-    async def _split_long_section(self, section: str) -> List[str]:
+        segments = []
+        position = 0
+        
+        for match in _STRUCTURE.finditer(content):
+            self._add_paragraph(segments, content, position, match.start())
+            if match.lastgroup != "blank":
+                start, end = _strip_span(content, *match.span(match.lastgroup))
+                segments.append(Segment(match.lastgroup, start, end))
+            position = match.end()
+        
+        self._add_paragraph(segments, content, position, len(content))
+        return segments
+    
+    @staticmethod
+    def _add_paragraph(segments: List[Segment], content: str, start: int, end: int):
+        """Add the text between two structural elements, if any, as a paragraph."""
+        start, end = _strip_span(content, start, end)
+        if start < end:
+            segments.append(Segment("paragraph", start, end))
+    
+    def _split_cache_key(self, section: str) -> str:
+        """Key a section's split by its text and everything else the split depends on."""
+        model_name = getattr(self.model, "model_name", str(self.model))
+        # chunk_overlap shapes the _simple_split fallback, which is cached too
+        settings = (
+            f"{model_name}|{self.config.chunk_size}|{self.config.chunk_overlap}|"
+            f"{self.config.max_chunk_size}|{self.config.min_chunk_size}"
+        )
+        return hashlib.sha256(f"{settings}\n{section}".encode()).hexdigest()
+    
+    async def _split_long_section(
+        self,
+        content: str,
+        start: int,
+        end: int,
+        semaphore: asyncio.Semaphore
+    ) -> List[Tuple[int, int]]:
         """
         Split a long section using LLM for semantic boundaries.
         
         Args:
-            section: Section to split
+            content: Document content
+            start: Start of the section in content
+            end: End of the section in content
+            semaphore: Limits how many sections are sent to the LLM at once
         
         Returns:
-            List of sub-chunks
+            List of sub-chunk spans in content
         """
+        section = content[start:end]
+        key = self._split_cache_key(section)
+        
+        if self._split_cache is not None:
+            cached = await asyncio.to_thread(self._split_cache.get, key)
+            if cached is not None:
+                return [(start + span_start, start + span_end) for span_start, span_end in cached]
+        
         try:
             prompt = f"""
             Split the following text into semantically coherent chunks. Each chunk should:
@@ -224,63 +482,77 @@ class SemanticChunker:
             """
             
             # Use Pydantic AI for LLM calls
-            from pydantic_ai import Agent
-            temp_agent = Agent(self.model)
-            
-            response = await temp_agent.run(prompt)
-            result = response.data
+            async with semaphore:
+                response = await self._get_agent().run(prompt)
+            result = response.output
             chunks = [chunk.strip() for chunk in result.split("---CHUNK---")]
             
-            # Validate chunks
-            valid_chunks = []
-            for chunk in chunks:
-                if (self.config.min_chunk_size <= len(chunk) <= self.config.max_chunk_size):
-                    valid_chunks.append(chunk)
-            
-            return valid_chunks if valid_chunks else self._simple_split(section)
-            
         except Exception as e:
             logger.error(f"LLM chunking failed: {e}")
-            return self._simple_split(section)
+            return self._simple_split(content, start, end)
+        
+        # Validate chunks and locate them in the section; the LLM returns
+        # text rather than offsets, so anything it rewrote can't be used
+        spans = []
+        position = 0
+        for chunk in chunks:
+            if not (self.config.min_chunk_size <= len(chunk) <= self.config.max_chunk_size):
+                continue
+            found = section.find(chunk, position)
+            if found == -1:
+                spans = []
+                break
+            spans.append((found, found + len(chunk)))
+            position = found + len(chunk)
+        
+        if not spans:
+            spans = self._simple_split(section)
+        
+        if self._split_cache is not None:
+            await asyncio.to_thread(self._split_cache.put, key, spans)
+        
+        return [(start + span_start, start + span_end) for span_start, span_end in spans]
     
-    def _simple_split(self, text: str) -> List[str]:
+    def _simple_split(self, text: str, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, int]]:
         """
         Simple text splitting as fallback.
         
         Args:
             text: Text to split
+            start: Start of the part of text to split
+            end: End of the part of text to split (defaults to the end of text)
         
         Returns:
-            List of chunks
+            List of chunk spans in text
         """
-        chunks = []
-        start = 0
+        end = len(text) if end is None else end
+        spans = []
         
-        while start < len(text):
-            end = start + self.config.chunk_size
+        while start < end:
+            window_end = start + self.config.chunk_size
             
-            if end >= len(text):
+            if window_end >= end:
                 # Last chunk
-                chunks.append(text[start:])
+                spans.append((start, end))
                 break
             
             # Try to end at a sentence boundary
-            chunk_end = end
-            for i in range(end, max(start + self.config.min_chunk_size, end - 200), -1):
+            chunk_end = window_end
+            for i in range(window_end, max(start + self.config.min_chunk_size, window_end - 200), -1):
                 if text[i] in '.!?\n':
                     chunk_end = i + 1
                     break
             
-            chunks.append(text[start:chunk_end])
-            start = chunk_end - self.config.chunk_overlap
+            spans.append((start, chunk_end))
+            start = max(chunk_end - self.config.chunk_overlap, start + 1)
         
-        return chunks
+        return spans
     
     def _simple_chunk(
         self,
         content: str,
         base_metadata: Dict[str, Any]
-    ) -> List[DocumentChunk]:
+    ) -> ChunkCollection:
         """
         Simple rule-based chunking.
         
@@ -291,56 +563,37 @@ class SemanticChunker:
         Returns:
             List of document chunks
         """
-        chunks = self._simple_split(content)
-        return self._create_chunk_objects(chunks, content, base_metadata)
+        spans = self._simple_split(content)
+        return self._create_chunk_objects(spans, content, base_metadata)
     
     def _create_chunk_objects(
         self,
-        chunks: List[str],
+        spans: List[Tuple[int, int]],
         original_content: str,
         base_metadata: Dict[str, Any]
-    ) -> List[DocumentChunk]:
+    ) -> ChunkCollection:
         """
-        Create DocumentChunk objects from text chunks.
+        Create a ChunkCollection from chunk spans.
         
         Args:
-            chunks: List of chunk texts
+            spans: List of chunk spans (start, end) in the original content
             original_content: Original document content
             base_metadata: Base metadata
         
         Returns:
-            List of DocumentChunk objects
+            Collection of document chunks
         """
-        chunk_objects = []
-        current_pos = 0
-        
-        for i, chunk_text in enumerate(chunks):
-            # Find the position of this chunk in the original content
-            start_pos = original_content.find(chunk_text, current_pos)
-            if start_pos == -1:
-                # Fallback: estimate position
-                start_pos = current_pos
-            
-            end_pos = start_pos + len(chunk_text)
-            
-            # Create chunk metadata
-            chunk_metadata = {
-                **base_metadata,
-                "chunk_method": "semantic" if self.config.use_semantic_splitting else "simple",
-                "total_chunks": len(chunks)
-            }
-            
-            chunk_objects.append(DocumentChunk(
-                content=chunk_text.strip(),
-                index=i,
-                start_char=start_pos,
-                end_char=end_pos,
-                metadata=chunk_metadata
-            ))
-            
-            current_pos = end_pos
+        # Metadata is the same for every chunk, so it is stored once
+        chunks = ChunkCollection(original_content, {
+            **base_metadata,
+            "chunk_method": "semantic" if self.config.use_semantic_splitting else "simple",
+            "total_chunks": len(spans)
+        })
+        
+        for start, end in spans:
+            chunks.append(*_strip_span(original_content, start, end))
         
-        return chunk_objects
+        return chunks
 
 
 class SimpleChunker:
@@ -356,7 +609,7 @@ class SimpleChunker:
         title: str,
         source: str,
         metadata: Optional[Dict[str, Any]] = None
-    ) -> List[DocumentChunk]:
+    ) -> ChunkCollection:
         """
         Chunk document using simple rules.
         
@@ -367,10 +620,10 @@ class SimpleChunker:
             metadata: Additional metadata
         
         Returns:
-            List of document chunks
+            Collection of document chunks
         """
         if not content.strip():
-            return []
+            return ChunkCollection(content)
         
         base_metadata = {
             "title": title,
@@ -379,74 +632,41 @@ class SimpleChunker:
             **(metadata or {})
         }
         
-        # Split on paragraphs first
-        paragraphs = re.split(r'\n\s*\n', content)
-        chunks = []
-        current_chunk = ""
-        current_pos = 0
-        chunk_index = 0
+        # Split on paragraphs first, keeping where each one is in the content
+        paragraphs = []
+        position = 0
+        for match in re.finditer(r'\n\s*\n', content):
+            paragraphs.append(_strip_span(content, position, match.start()))
+            position = match.end()
+        paragraphs.append(_strip_span(content, position, len(content)))
         
-        for paragraph in paragraphs:
-            paragraph = paragraph.strip()
-            if not paragraph:
+        chunks = ChunkCollection(content, base_metadata)
+        chunk_start = None
+        chunk_end = None
+        
+        for start, end in paragraphs:
+            if start == end:
                 continue
             
-            # Check if adding this paragraph exceeds chunk size
-            potential_chunk = current_chunk + "\n\n" + paragraph if current_chunk else paragraph
-            
-            if len(potential_chunk) <= self.config.chunk_size:
-                current_chunk = potential_chunk
+            # Check if extending the current chunk to this paragraph exceeds chunk size
+            if chunk_start is not None and end - chunk_start <= self.config.chunk_size:
+                chunk_end = end
             else:
                 # Save current chunk if it exists
-                if current_chunk:
-                    chunks.append(self._create_chunk(
-                        current_chunk,
-                        chunk_index,
-                        current_pos,
-                        current_pos + len(current_chunk),
-                        base_metadata.copy()
-                    ))
-                    
-                    # Move position, but ensure overlap is respected
-                    overlap_start = max(0, len(current_chunk) - self.config.chunk_overlap)
-                    current_pos += overlap_start
-                    chunk_index += 1
+                if chunk_start is not None:
+                    chunks.append(chunk_start, chunk_end)
                 
                 # Start new chunk with current paragraph
-                current_chunk = paragraph
+                chunk_start, chunk_end = start, end
         
         # Add final chunk
-        if current_chunk:
-            chunks.append(self._create_chunk(
-                current_chunk,
-                chunk_index,
-                current_pos,
-                current_pos + len(current_chunk),
-                base_metadata.copy()
-            ))
-        
-        # Update total chunks in metadata
-        for chunk in chunks:
-            chunk.metadata["total_chunks"] = len(chunks)
+        if chunk_start is not None:
+            chunks.append(chunk_start, chunk_end)
+        
+        # Metadata is shared, so this sets it for every chunk
+        chunks.metadata["total_chunks"] = len(chunks)
         
         return chunks
-    
-    def _create_chunk(
-        self,
-        content: str,
-        index: int,
-        start_pos: int,
-        end_pos: int,
-        metadata: Dict[str, Any]
-    ) -> DocumentChunk:
-        """Create a DocumentChunk object."""
-        return DocumentChunk(
-            content=content.strip(),
-            index=index,
-            start_char=start_pos,
-            end_char=end_pos,
-            metadata=metadata
-        )
 
 
 # Factory function
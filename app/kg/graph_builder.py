@@ -13,7 +13,7 @@ import re
 from graphiti_core import Graphiti
 from dotenv import load_dotenv
 
-from chunker import DocumentChunk
+from chunker import ChunkCollection, DocumentChunk
 
 # Import graph utilities
 try:
@@ -53,7 +53,7 @@ class PolicyGraphBuilder:
     
     async def add_policy_document_to_graph(
         self,
-        chunks: List[DocumentChunk],
+        chunks: ChunkCollection,
         policy_title: str,
         policy_uin: str,
         policy_metadata: Optional[Dict[str, Any]] = None,
@@ -195,17 +195,20 @@ class PolicyGraphBuilder:
     
     async def extract_policy_entities_from_chunks(
         self,
-        chunks: List[DocumentChunk],
+        chunks: ChunkCollection,
         extract_coverage_terms: bool = True,
         extract_medical_conditions: bool = True,
         extract_financial_terms: bool = True,
         extract_regulatory_terms: bool = True
-    ) -> List[DocumentChunk]:
+    ) -> ChunkCollection:
         """
         Extract policy-specific entities from chunks and add to metadata.
         
+        Entities are stored on each chunk in place; the extraction date is the
+        same for the whole batch, so it is stored once with the document's metadata.
+        
         Args:
-            chunks: List of document chunks
+            chunks: Collection of document chunks
             extract_coverage_terms: Whether to extract coverage-related terms
             extract_medical_conditions: Whether to extract medical conditions
             extract_financial_terms: Whether to extract financial terms
@@ -216,7 +219,7 @@ class PolicyGraphBuilder:
         """
         logger.info(f"Extracting policy entities from {len(chunks)} chunks")
         
-        enriched_chunks = []
+        chunks.metadata["entity_extraction_date"] = datetime.now().isoformat()
         
         for chunk in chunks:
             entities = {
@@ -250,28 +253,10 @@ class PolicyGraphBuilder:
             if extract_regulatory_terms:
                 entities["regulatory_terms"] = self._extract_regulatory_terms(content)
             
-            # Create enriched chunk
-            enriched_chunk = DocumentChunk(
-                content=chunk.content,
-                index=chunk.index,
-                start_char=chunk.start_char,
-                end_char=chunk.end_char,
-                metadata={
-                    **chunk.metadata,
-                    "policy_entities": entities,
-                    "entity_extraction_date": datetime.now().isoformat()
-                },
-                token_count=chunk.token_count
-            )
-            
-            # Preserve embedding if it exists
-            if hasattr(chunk, 'embedding'):
-                enriched_chunk.embedding = chunk.embedding
-            
-            enriched_chunks.append(enriched_chunk)
+            chunk.metadata["policy_entities"] = entities
         
         logger.info("Policy entity extraction complete")
-        return enriched_chunks
+        return chunks
     
     def _extract_coverage_terms(self, text: str) -> List[str]:
         """Extract coverage-related terms from policy text."""
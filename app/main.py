@@ -1,16 +1,58 @@
+from contextlib import asynccontextmanager
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.core import get_settings
+from app.utils.executors import shutdown_executors
+from app.utils.loop_monitor import LoopBlockMonitor
+from app.services.http_clients import start_http_clients, close_http_clients
+from app.services.vector_store import get_vector_store
+from app.services.write_behind import ingestion_writes
+from app.services.warmup import warmup, warmup_state
 
 settings = get_settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts and stops process-wide resources."""
+    monitor = None
+    if settings.loop_block_monitor:
+        monitor = LoopBlockMonitor(
+            asyncio.get_running_loop(),
+            threshold=settings.loop_block_threshold_ms / 1000
+        )
+        monitor.start()
+
+    await start_http_clients()
+
+    # Runs in the background so liveness checks pass while /ready still reports 503
+    warmup_task = asyncio.create_task(warmup()) if settings.warmup_enabled else None
+    if warmup_task is None:
+        warmup_state["ready"] = True
+
+    yield
+
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    # Chunks of recent uploads may still be on their way to the vector store
+    await ingestion_writes.drain(timeout=settings.write_behind_drain_seconds)
+    await close_http_clients()
+    if get_vector_store.cache_info().currsize:
+        get_vector_store().close()
+    if monitor:
+        monitor.stop()
+    shutdown_executors()
+
 app = FastAPI(
     title="Backend-API",
     description="Backend for Bajaj HackRx 6.0",
     version="0.1.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 origins = ["*"] 
@@ -41,6 +83,15 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+@app.get("/ready", tags=["health"])
+async def readiness_check():
+    """Readiness endpoint; 503 until warmup has loaded the tokenizer, clients and agent."""
+    status_code = 200 if warmup_state["ready"] else 503
+    return JSONResponse(status_code=status_code, content={
+        "status": "ready" if warmup_state["ready"] else "warming_up",
+        "warmup": warmup_state,
+    })
+
 
 # Run with: uvicorn app.main:app --reload
 if __name__ == "__main__":
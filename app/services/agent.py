@@ -1,7 +1,7 @@
 from typing import Literal, Optional, Any, Dict, List
-from pydantic_ai import RunContext, Agent
 # from crawl4ai import AsyncWebCrawler
 from dataclasses import dataclass
+from functools import lru_cache
 from dotenv import load_dotenv
 import logging
 import httpx
@@ -14,63 +14,73 @@ load_dotenv()
 class ApiDependencies:
     http_client: httpx.AsyncClient
 
-agent = Agent(
-    "google-gla:gemini-2.5-pro",
-    system_prompt=RAG_AGENT_SYSTEM_PROMPT,
-    deps_type=ApiDependencies,
-    retries=2
-)
-
-@agent.tool
-async def api_request(
-    ctx: RunContext,
-    url: str,
-    method: Literal["GET", "POST", "PUT", "DELETE", "PATCH"],
-    payload: Optional[Dict[str, Any]] = None,
-) -> Any:
+@lru_cache()
+def get_agent():
     """
-    Makes a generic HTTP request to a specified URL and returns the JSON response.
-
-    Use this tool to interact with any external API to fetch or send data when
-    no other more specific tool is available.
-    **This tool can also be used for getting html of a website by doing a GET request to that website**
-
-    Args:
-    url: The full, absolute URL of the API endpoint to request. Must be a valid HTTP or HTTPS URL.
-    method: The HTTP method to use. Must be one of 'GET', 'POST', 'PUT', 'DELETE', or 'PATCH'.
-    payload: An optional dictionary of data to send as the JSON body. Typically used with 'POST', 'PUT', or 'PATCH' methods.
+    Builds the RAG agent on first use; pydantic-ai and the model client are
+    slow to import, so this is deferred to warmup or the first question.
     """
-    try:
-        logging.info(f"Calling API request tool. URL: {url} Method: {method} Payload: {payload}")
-
-        response = await ctx.deps.http_client.request(
-            method=method,
-            url=url,
-            json=payload if payload else None,
-            follow_redirects=True,
-            timeout=10.0,
-        )
-        response.raise_for_status()
-
-        logging.info(f"{response.text}")
-
-        if response.status_code!= 204:
-            return response.text
-        else:
-            return {"status": "success", "code": response.status_code}
-    except httpx.HTTPStatusError as e:
-        error_body = e.response.text
-        logging.error(error_body)
-        return {
-            "error": "HTTP Error", 
-            "status_code": e.response.status_code, 
-            "details": f"The server responded with an error. Response body: {error_body[:500]}"
-        }
-    except httpx.RequestError as e:
-        return {"error": "Request Error", "details": f"A network error occurred: {e}"}
-    except Exception as e:
-        logging.error(e)
-        return {"error": "An unexpected error occurred", "details": str(e)}
+    from pydantic_ai import RunContext, Agent
+
+    agent = Agent(
+        "google-gla:gemini-2.5-pro",
+        system_prompt=RAG_AGENT_SYSTEM_PROMPT,
+        deps_type=ApiDependencies,
+        retries=2
+    )
+
+    @agent.tool
+    async def api_request(
+        ctx: RunContext,
+        url: str,
+        method: Literal["GET", "POST", "PUT", "DELETE", "PATCH"],
+        payload: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """
+        Makes a generic HTTP request to a specified URL and returns the JSON response.
+
+        Use this tool to interact with any external API to fetch or send data when
+        no other more specific tool is available.
+        **This tool can also be used for getting html of a website by doing a GET request to that website**
+
+        Args:
+        url: The full, absolute URL of the API endpoint to request. Must be a valid HTTP or HTTPS URL.
+        method: The HTTP method to use. Must be one of 'GET', 'POST', 'PUT', 'DELETE', or 'PATCH'.
+        payload: An optional dictionary of data to send as the JSON body. Typically used with 'POST', 'PUT', or 'PATCH' methods.
+        """
+        try:
+            logging.info(f"Calling API request tool. URL: {url} Method: {method} Payload: {payload}")
+
+            response = await ctx.deps.http_client.request(
+                method=method,
+                url=url,
+                json=payload if payload else None,
+                follow_redirects=True,
+                timeout=10.0,
+            )
+            response.raise_for_status()
+
+            logging.info(f"{response.text}")
+
+            if response.status_code!= 204:
+                return response.text
+            else:
+                return {"status": "success", "code": response.status_code}
+        except httpx.HTTPStatusError as e:
+            error_body = e.response.text
+            logging.error(error_body)
+            return {
+                "error": "HTTP Error", 
+                "status_code": e.response.status_code, 
+                "details": f"The server responded with an error. Response body: {error_body[:500]}"
+            }
+        except httpx.RequestError as e:
+            return {"error": "Request Error", "details": f"A network error occurred: {e}"}
+        except Exception as e:
+            logging.error(e)
+            return {"error": "An unexpected error occurred", "details": str(e)}
+
+    return agent
 
 # @agent.tool_plain
 # async def crawl_and_aggregate_website(
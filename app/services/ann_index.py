@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+ChunkKey = Tuple[str, int]
+
+class AnnUnavailable(RuntimeError):
+    pass
+
+@contextmanager
+def _directory_lock(directory: str, exclusive: bool) -> Iterator[None]:
+    """Locks the index directory across processes, so index.bin and labels.json are read and written as a pair."""
+    import fcntl
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+class HnswIndex:
+    """
+    Approximate nearest-neighbour index over every chunk of every document.
+
+    Wraps an hnswlib HNSW graph on inner product over L2-normalized vectors,
+    so similarity is 1 - distance, like cosine similarity in exact search.
+    Each vector gets an integer label that maps back to (source_file,
+    chunk_number). Replacing or deleting a chunk marks its old label deleted
+    instead of rebuilding the graph.
+
+    Build parameters are m and ef_construction; the search parameter is
+    ef_search, which must be at least k and trades latency for recall.
+    save() writes index.bin and labels.json to directory. labels.json also
+    records which version of each document was added, so the owner can
+    re-add documents written after the last save, including those written by
+    other processes sharing the directory. Saves and loads hold a file lock
+    on the directory, so processes never see one's index.bin with another's
+    labels.json.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        dimensions: int,
+        m: int = 32,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        initial_capacity: int = 100_000,
+    ):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise AnnUnavailable("hnswlib is not installed; install the 'ann' extra") from e
+
+        self.directory = directory
+        self.dimensions = dimensions
+        self.ef_search = ef_search
+        self._lock = threading.RLock()
+        self._labels: Dict[int, ChunkKey] = {}
+        self._by_key: Dict[ChunkKey, int] = {}
+        self.versions: Dict[str, Any] = {}
+        self._next_label = 0
+        self.dirty = False
+        self.saved_at = time.monotonic()
+
+        self._index = hnswlib.Index(space="ip", dim=dimensions)
+        index_path = os.path.join(directory, "index.bin")
+        labels_path = os.path.join(directory, "labels.json")
+
+        with _directory_lock(directory, exclusive=False):
+            saved = None
+            if os.path.exists(index_path) and os.path.exists(labels_path):
+                with open(labels_path, encoding="utf-8") as f:
+                    saved = json.load(f)
+                self._index.load_index(index_path, max_elements=max(initial_capacity, saved["next_label"]), allow_replace_deleted=False)
+
+        if saved is not None:
+            self._next_label = saved["next_label"]
+            self.versions = saved["versions"]
+            for label, source_file, chunk_number in saved["labels"]:
+                self._labels[label] = (source_file, chunk_number)
+                self._by_key[(source_file, chunk_number)] = label
+            logging.info(f"Loaded ANN index with {len(self._labels)} vectors from {directory}")
+        else:
+            self._index.init_index(max_elements=initial_capacity, M=m, ef_construction=ef_construction)
+
+        self._index.set_ef(ef_search)
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def _ensure_capacity(self, extra: int):
+        needed = self._next_label + extra
+        capacity = self._index.get_max_elements()
+        if needed > capacity:
+            self._index.resize_index(max(needed, capacity * 2))
+
+    def _remove_label(self, label: int):
+        key = self._labels.pop(label)
+        del self._by_key[key]
+        self._index.mark_deleted(label)
+
+    def add(self, keys: List[ChunkKey], vectors, version: Optional[Dict[str, Any]] = None):
+        """
+        Adds normalized vectors under keys, replacing earlier vectors of the
+        same keys. version maps source_file to the document version added.
+        """
+        import numpy as np
+
+        if not keys:
+            return
+        with self._lock:
+            for key in keys:
+                if key in self._by_key:
+                    self._remove_label(self._by_key[key])
+
+            self._ensure_capacity(len(keys))
+            labels = np.arange(self._next_label, self._next_label + len(keys))
+            self._index.add_items(np.asarray(vectors, dtype=np.float32), labels)
+            for label, key in zip(labels.tolist(), keys):
+                self._labels[label] = key
+                self._by_key[key] = label
+            self._next_label += len(keys)
+            self.versions.update(version or {})
+            self.dirty = True
+
+    def remove_document(self, source_file: str):
+        with self._lock:
+            for label in [label for label, key in self._labels.items() if key[0] == source_file]:
+                self._remove_label(label)
+            self.versions.pop(source_file, None)
+            self.dirty = True
+
+    def search(self, query: Sequence[float], k: int) -> List[Tuple[ChunkKey, float]]:
+        import numpy as np
+
+        with self._lock:
+            available = len(self._labels)
+            if not available:
+                return []
+            k = min(k, available)
+            self._index.set_ef(max(self.ef_search, k))
+            labels, distances = self._index.knn_query(np.asarray(query, dtype=np.float32), k=k)
+
+            return [
+                (self._labels[label], 1.0 - float(distance))
+                for label, distance in zip(labels[0].tolist(), distances[0].tolist())
+                if label in self._labels
+            ]
+
+    def save(self):
+        # Temp names are per process, in case another process is saving the same directory
+        index_tmp = os.path.join(self.directory, f"index.bin.{os.getpid()}.tmp")
+        labels_tmp = os.path.join(self.directory, f"labels.json.{os.getpid()}.tmp")
+        with self._lock, _directory_lock(self.directory, exclusive=True):
+            self._index.save_index(index_tmp)
+            with open(labels_tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "next_label": self._next_label,
+                    "versions": self.versions,
+                    "labels": [[label, *key] for label, key in self._labels.items()],
+                }, f)
+            os.replace(index_tmp, os.path.join(self.directory, "index.bin"))
+            os.replace(labels_tmp, os.path.join(self.directory, "labels.json"))
+            self.dirty = False
+            self.saved_at = time.monotonic()
@@ -1,62 +1,192 @@
-from typing import List
-import tiktoken
-
-def find_smart_boundary(chunk_text: str) -> str:
-    if '\n\n' in chunk_text:
-        last_paragraph = chunk_text.rfind('\n\n')
-        if last_paragraph > len(chunk_text) * 0.3:
-            return chunk_text[:last_paragraph].strip()
-    
-    sentence_endings = ['. ', '! ', '? ', '.\n', '!\n', '?\n']
-    best_sentence_end = -1
-    
-    for ending in sentence_endings:
-        pos = chunk_text.rfind(ending)
-        if pos > best_sentence_end and pos > len(chunk_text) * 0.3:
-            best_sentence_end = pos + len(ending) - 1
-    
-    if best_sentence_end > -1:
-        return chunk_text[:best_sentence_end + 1].strip()
-    
-    last_space = chunk_text.rfind(' ')
-    if last_space > len(chunk_text) * 0.3:
-        return chunk_text[:last_space].strip()
-    
-    return chunk_text.strip()
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, List, NamedTuple, Tuple
 
-def token_chunking(text: str, max_tokens: int = 1500, overlap_tokens: int = 50) -> List[str]:
+@lru_cache()
+def get_encoding():
+    import tiktoken
+
+    return tiktoken.get_encoding("cl100k_base")  # same tokenizer as OpenAI/Gemini-compatible
+
+@lru_cache()
+def _token_char_tables() -> Tuple[Any, Any]:
+    """
+    For every token id: how many characters start in its bytes, and whether
+    its first byte continues a character begun by the previous token.
+    """
+    import numpy as np
+
+    encoding = get_encoding()
+    starts = np.zeros(encoding.n_vocab, dtype=np.int64)
+    continues = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            data = encoding.decode_single_token_bytes(token)
+        except KeyError:
+            continue
+        starts[token] = sum(1 for byte in data if not 0x80 <= byte < 0xC0)
+        continues[token] = 1 if data and 0x80 <= data[0] < 0xC0 else 0
+    return starts, continues
+
+_PARAGRAPH_BREAK = re.compile(r"\n\n")
+_SENTENCE_END = re.compile(r"[.!?](?=[ \n])")
+
+class ChunkSpan(NamedTuple):
+    start: int  # first character of the chunk
+    end: int  # one past its last character
+    start_token: int  # first token of the window it was cut from
+    end_token: int  # token the cut falls in; the next window overlaps from before it
+
+class TokenizedText:
+    """
+    Text encoded once, with the character offset of every token and the
+    positions of its paragraph and sentence breaks, so windows can be cut
+    by bisecting instead of decoding and scanning each one.
+    """
+
+    def __init__(self, text: str):
+        import numpy as np
+
+        self.text = text
+        self.tokens = get_encoding().encode_ordinary(text)
+        starts, continues = _token_char_tables()
+        ids = np.array(self.tokens, dtype=np.int64)
+        # Characters started before each token; the last entry is the whole text
+        self._char_starts = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(starts[ids], out=self._char_starts[1:])
+        self._char_starts[:-1] -= continues[ids]
+        self.paragraphs = [match.start() for match in _PARAGRAPH_BREAK.finditer(text)]
+        self.sentences = [match.start() for match in _SENTENCE_END.finditer(text)]
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def char_offset(self, token: int) -> int:
+        """Offset of the first character of a token (or of the end of the text)."""
+        if token >= len(self.tokens):
+            return len(self.text)
+        return int(self._char_starts[token])
+
+    def token_at(self, char: int) -> int:
+        """Index of the token containing a character."""
+        index = int(self._char_starts.searchsorted(char, side="right")) - 1
+        return min(max(index, 0), len(self.tokens))
+
+    def boundary(self, first: int, last: int) -> int:
+        """
+        Where to end a window covering text[first:last]: the last paragraph
+        break, else the last sentence end, else the last space, as long as
+        it keeps at least 30% of the window.
+        """
+        floor = first + (last - first) * 0.3
+
+        index = bisect_right(self.paragraphs, last - 2) - 1
+        if index >= 0 and self.paragraphs[index] > floor:
+            return self.paragraphs[index]
+
+        index = bisect_right(self.sentences, last - 2) - 1
+        if index >= 0 and self.sentences[index] > floor:
+            return self.sentences[index] + 1
+
+        space = self.text.rfind(" ", first, last)
+        if space > floor:
+            return space
+
+        return last
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def cut_windows(
+    tokenized: TokenizedText,
+    max_tokens: int = 1500,
+    overlap_tokens: int = 50,
+    hold_back: int = 0,
+) -> Tuple[List[ChunkSpan], int]:
+    """
+    Cuts tokenized text into windows of at most max_tokens, each ending at a
+    smart boundary. The next window starts overlap_tokens before where the
+    previous one was actually cut, so no text between windows is lost.
+
+    Stops before any window with fewer than hold_back tokens left after its
+    start. Returns the chunk spans and the token the next window starts at.
+    """
+    text = tokenized.text
+    count = len(tokenized)
+    spans = []
+    start = 0
+
+    while start < count and (hold_back == 0 or count - start >= hold_back):
+        end = min(start + max_tokens, count)
+        first = tokenized.char_offset(start)
+        last = tokenized.char_offset(end)
+
+        if end < count:
+            last = tokenized.boundary(first, last)
+            end = max(tokenized.token_at(last), start + 1)
+
+        chunk_start, chunk_end = _strip_span(text, first, last)
+        if chunk_start < chunk_end:
+            spans.append(ChunkSpan(chunk_start, chunk_end, start, end))
+
+        if end >= count:
+            start = count
+            break
+        start = max(end - overlap_tokens, start + 1)
+
+    return spans, start
+
+def chunk_spans(text: str, max_tokens: int = 1500, overlap_tokens: int = 50) -> List[ChunkSpan]:
+    """Character and token spans of text's chunks, without copying any of it."""
     if not text.strip():
         return []
-    
-    encoding = tiktoken.get_encoding("cl100k_base")  # same tokenizer as OpenAI/Gemini-compatible
-    tokens = encoding.encode(text)
-    
-    if len(tokens) <= max_tokens:
-        return [text.strip()]
-    
-    chunks = []
-    start_idx = 0
-    
-    while start_idx < len(tokens):
-        end_idx = min(start_idx + max_tokens, len(tokens))
-        
-        chunk_tokens = tokens[start_idx:end_idx]
-        chunk = encoding.decode(chunk_tokens)
-        
-        if end_idx < len(tokens):
-            chunk = find_smart_boundary(chunk)
-        
-        chunk = chunk.strip()
-        if chunk:
-            chunks.append(chunk)
-        
-        if end_idx >= len(tokens):
-            break
-            
-        overlap_start = max(0, end_idx - overlap_tokens)
-        start_idx = overlap_start if overlap_start > start_idx else end_idx
 
-    return chunks
+    spans, _ = cut_windows(TokenizedText(text), max_tokens, overlap_tokens)
+    return spans
+
+def token_chunking(text: str, max_tokens: int = 1500, overlap_tokens: int = 50) -> List[str]:
+    return [text[span.start:span.end] for span in chunk_spans(text, max_tokens, overlap_tokens)]
+
+class TokenChunker:
+    """
+    Incremental token_chunking: feed text as it is extracted and get chunks as
+    soon as they are complete, holding at most about one chunk of text.
+
+    Windows are cut exactly like token_chunking's, except that boundaries are
+    found within the text buffered so far. A window is only cut once lookahead
+    more tokens have arrived, so token boundaries at the end of the buffer
+    can't affect it.
+    """
+
+    def __init__(self, max_tokens: int = 1500, overlap_tokens: int = 50, lookahead_tokens: int = 64):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.lookahead_tokens = lookahead_tokens
+        self.buffer = ""
+
+    def _cut(self, final: bool) -> List[str]:
+        tokenized = TokenizedText(self.buffer)
+        hold_back = 0 if final else self.max_tokens + self.lookahead_tokens
+        spans, next_token = cut_windows(tokenized, self.max_tokens, self.overlap_tokens, hold_back)
+
+        chunks = [self.buffer[span.start:span.end] for span in spans]
+        self.buffer = self.buffer[tokenized.char_offset(next_token):]
+        return chunks
+
+    def feed(self, text: str) -> List[str]:
+        self.buffer += text
+        return self._cut(final=False)
+
+    def finish(self) -> List[str]:
+        if not self.buffer.strip():
+            self.buffer = ""
+            return []
+        return self._cut(final=True)
 
 def cahrcter_chunking(text: str, chunk_size: int = 1000) -> List[str]:
     chunks = []
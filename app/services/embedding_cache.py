@@ -0,0 +1,206 @@
+import os
+import re
+import time
+import array
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core import get_settings
+from app.utils.executors import run_blocking
+
+settings = get_settings()
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    # Same clause with different line wrapping or unicode forms maps to one entry
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+def cache_key(model: str, dimensions: int, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\0{dimensions}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    return array.array("f", vector).tobytes()
+
+def unpack_vector(blob: bytes) -> List[float]:
+    values = array.array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by hash(model, dimensions, normalized text).
+
+    Vectors are stored as float32 blobs in SQLite. When the stored vectors
+    exceed max_bytes, the least recently used entries are evicted down to
+    about 90% of the limit. The database runs in WAL mode so several workers
+    can share one file. The async methods never fail a request over the
+    cache: a read that errors is a miss, and a write that errors is skipped.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def _select_in(self, query: str, keys: List[bytes]) -> List[tuple]:
+        rows = []
+        unique = list(dict.fromkeys(keys))
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            part = unique[start:start + 500]
+            rows.extend(self._conn.execute(f"{query} WHERE key IN ({','.join('?' * len(part))})", part).fetchall())
+        return rows
+
+    @contextmanager
+    def _rollback_on_error(self):
+        # Leaves no transaction open holding the database lock
+        try:
+            yield
+        except sqlite3.Error:
+            try:
+                self._conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[List[float]]]:
+        if not keys:
+            return []
+
+        with self._lock, self._rollback_on_error():
+            found: Dict[bytes, bytes] = dict(self._select_in("SELECT key, vector FROM embeddings", keys))
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+        results = [unpack_vector(found[key]) if key in found else None for key in keys]
+        hits = sum(result is not None for result in results)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return results
+
+    def put_many(self, items: List[Tuple[bytes, Sequence[float]]]):
+        """Stores (key, vector) pairs, then evicts if the cache grew past max_bytes."""
+        if not items:
+            return
+
+        now = time.time()
+        rows = []
+        for key, vector in dict(items).items():
+            blob = pack_vector(vector)
+            rows.append((key, blob, len(blob), now))
+
+        with self._lock, self._rollback_on_error():
+            replaced = self._select_in("SELECT key, size FROM embeddings", [row[0] for row in rows])
+            existing = sum(size for _, size in replaced)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._size += sum(row[2] for row in rows) - existing
+            if self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        target = int(self.max_bytes * 0.9)
+        # Another worker may have written to the same file; start from the real size
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        removed = 0
+        while self._size > target:
+            batch = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not batch:
+                break
+            to_remove = []
+            for key, size in batch:
+                if self._size <= target:
+                    break
+                to_remove.append((key,))
+                self._size -= size
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", to_remove)
+            removed += len(to_remove)
+
+        self.evictions += removed
+        logging.info(f"Evicted {removed} cached embeddings, cache is now {self._size} bytes")
+
+    async def aget_many(self, keys: List[bytes]) -> List[Optional[List[float]]]:
+        try:
+            return await run_blocking(self.get_many, keys)
+        except sqlite3.Error as e:
+            self.errors += 1
+            self.misses += len(keys)
+            logging.error(f"Embedding cache read failed, treating {len(keys)} lookups as misses: {e}")
+            return [None] * len(keys)
+
+    async def aput_many(self, items: List[Tuple[bytes, Sequence[float]]]):
+        try:
+            await run_blocking(self.put_many, items)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logging.error(f"Embedding cache write failed, not caching {len(items)} embeddings: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+@lru_cache()
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    if not settings.embedding_cache_enabled:
+        return None
+    try:
+        return EmbeddingCache(settings.embedding_cache_path, settings.embedding_cache_max_mb * 1024 * 1024)
+    except sqlite3.Error as e:
+        # The cache only saves API calls; run without it rather than fail requests
+        logging.error(f"Could not open embedding cache at {settings.embedding_cache_path}: {e}")
+        return None
@@ -0,0 +1,256 @@
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from app.core import get_settings
+from app.services.embedding_cache import EmbeddingCache, cache_key, get_embedding_cache
+from app.services.scheduler import BULK, ModelScheduler, get_scheduler
+from app.utils.executors import run_blocking
+
+settings = get_settings()
+
+# Texts shorter than this in total, like a request's questions, are counted on
+# the loop rather than queued behind document parsing on the extract pool
+INLINE_COUNT_CHARS = 16 * 1024
+
+class EmbeddingError(RuntimeError):
+    pass
+
+@dataclass
+class EmbeddingStats:
+    items: int = 0
+    cached: int = 0
+    batches: int = 0
+    requests: int = 0
+    retried_items: int = 0
+    seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "cached": self.cached,
+            "batches": self.batches,
+            "requests": self.requests,
+            "retried_items": self.retried_items,
+            "seconds": round(self.seconds, 3),
+            "chunks_per_second": round(self.chunks_per_second, 2),
+        }
+
+class BatchEmbedder:
+    """
+    Embeds many texts with as few requests as possible.
+
+    Texts are packed greedily, in order, into requests capped by item count and
+    by token budget. Tokens are counted once per text, off the event loop, and
+    the same counts are what each request reserves from the scheduler. At most
+    max_in_flight requests run at once. Results come back in input order, and
+    when a request fails or returns only some of its embeddings, only the
+    missing items are retried. With a cache, only texts it
+    has not seen before are sent, each once. With a scheduler, requests go
+    through its rate limits, and failed requests have already been retried there.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable,
+        model: str,
+        dimensions: int,
+        max_batch_items: int = 100,
+        max_batch_tokens: int = 20000,
+        max_in_flight: int = 4,
+        max_retries: int = 3,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        cache: Optional[EmbeddingCache] = None,
+        scheduler: Optional[ModelScheduler] = None,
+    ):
+        self.client_factory = client_factory
+        self.model = model
+        self.dimensions = dimensions
+        self.max_batch_items = max_batch_items
+        self.max_batch_tokens = max_batch_tokens
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.count_tokens = count_tokens or (lambda text: len(text) // 4 + 1)
+        self.cache = cache
+        self.scheduler = scheduler
+        self.totals = EmbeddingStats()
+        self.last_run = EmbeddingStats()
+
+    def _count_all(self, texts: List[str]) -> List[int]:
+        return [self.count_tokens(text) for text in texts]
+
+    def pack(self, token_counts: List[int]) -> List[List[int]]:
+        """Splits text indices into batches by their token counts; a text over the token budget gets a batch of its own."""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+
+        for i, tokens in enumerate(token_counts):
+            if current and (len(current) >= self.max_batch_items or current_tokens + tokens > self.max_batch_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _request(self, texts: List[str], tokens: int, priority: str):
+        request = lambda: self.client_factory().embeddings.create(
+            model=self.model,
+            dimensions=self.dimensions,
+            input=texts,
+        )
+        if self.scheduler is None:
+            return await request()
+        return await self.scheduler.call(
+            self.model,
+            request,
+            tokens=tokens,
+            priority=priority,
+        )
+
+    async def _embed_batch(
+        self,
+        indices: List[int],
+        texts: List[str],
+        token_counts: List[int],
+        results: List,
+        semaphore: asyncio.Semaphore,
+        stats: EmbeddingStats,
+        priority: str,
+    ):
+        pending = indices
+        error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                stats.retried_items += len(pending)
+                await asyncio.sleep(min(8.0, 0.5 * 2 ** (attempt - 1)) * (0.5 + random.random()))
+
+            async with semaphore:
+                stats.requests += 1
+                try:
+                    response = await self._request(
+                        [texts[i] for i in pending],
+                        sum(token_counts[i] for i in pending),
+                        priority,
+                    )
+                except Exception as e:
+                    if self.scheduler is not None:
+                        raise EmbeddingError(f"Failed to embed {len(pending)} items: {e}") from e
+                    error = e
+                    logging.warning(f"Embedding request for {len(pending)} items failed (attempt {attempt + 1}): {e}")
+                    continue
+
+            returned = {item.index: item.embedding for item in response.data if item.embedding}
+            failed = []
+            for position, i in enumerate(pending):
+                if position in returned:
+                    results[i] = returned[position]
+                else:
+                    failed.append(i)
+
+            if not failed:
+                return
+            error = EmbeddingError(f"{len(failed)} of {len(pending)} embeddings missing from response")
+            pending = failed
+
+        raise EmbeddingError(f"Failed to embed {len(pending)} items after {self.max_retries + 1} attempts: {error}")
+
+    async def _embed_uncached(self, texts: List[str], stats: EmbeddingStats, priority: str) -> List[List[float]]:
+        if sum(len(text) for text in texts) < INLINE_COUNT_CHARS:
+            token_counts = self._count_all(texts)
+        else:
+            token_counts = await run_blocking(self._count_all, texts, pool="extract")
+        batches = self.pack(token_counts)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        stats.batches += len(batches)
+
+        await asyncio.gather(*[
+            self._embed_batch(batch, texts, token_counts, results, semaphore, stats, priority) for batch in batches
+        ])
+        return results
+
+    async def _embed_through_cache(self, texts: List[str], stats: EmbeddingStats, priority: str) -> List[List[float]]:
+        keys = [cache_key(self.model, self.dimensions, text) for text in texts]
+        results = await self.cache.aget_many(keys)
+
+        # Identical texts within the document are embedded once
+        missing: Dict[bytes, str] = {}
+        for key, text, result in zip(keys, texts, results):
+            if result is None:
+                missing.setdefault(key, text)
+        stats.cached = len(texts) - sum(result is None for result in results)
+
+        if missing:
+            embedded = await self._embed_uncached(list(missing.values()), stats, priority)
+            fresh = dict(zip(missing.keys(), embedded))
+            await self.cache.aput_many(list(fresh.items()))
+            results = [fresh[key] if result is None else result for key, result in zip(keys, results)]
+
+        return results
+
+    async def embed_many(self, texts: List[str], priority: str = BULK) -> List[List[float]]:
+        if not texts:
+            return []
+
+        started = time.monotonic()
+        stats = EmbeddingStats(items=len(texts))
+
+        try:
+            if self.cache is not None:
+                results = await self._embed_through_cache(texts, stats, priority)
+            else:
+                results = await self._embed_uncached(texts, stats, priority)
+        finally:
+            stats.seconds = time.monotonic() - started
+            self.last_run = stats
+            self.totals.items += stats.items
+            self.totals.cached += stats.cached
+            self.totals.batches += stats.batches
+            self.totals.requests += stats.requests
+            self.totals.retried_items += stats.retried_items
+            self.totals.seconds += stats.seconds
+
+        logging.info(
+            f"Embedded {stats.items} chunks ({stats.cached} cached) in {stats.batches} batches ({stats.requests} requests) "
+            f"in {stats.seconds:.2f}s: {stats.chunks_per_second:.1f} chunks/s"
+        )
+        return results
+
+def embedding_stats() -> dict:
+    cache = get_embedding_cache()
+    return {
+        "totals": get_batch_embedder().totals.as_dict(),
+        "cache": cache.stats() if cache is not None else None,
+    }
+
+@lru_cache()
+def get_batch_embedder() -> BatchEmbedder:
+    from app.services.vector_store_service import get_openai_client
+    from app.services.chunker import get_encoding
+
+    encoding = get_encoding()
+    return BatchEmbedder(
+        client_factory=get_openai_client,
+        model=settings.embedding_model,
+        dimensions=settings.embedding_dimensions,
+        max_batch_items=settings.embedding_batch_items,
+        max_batch_tokens=settings.embedding_batch_tokens,
+        max_in_flight=settings.embedding_max_in_flight,
+        max_retries=settings.embedding_max_retries,
+        count_tokens=lambda text: len(encoding.encode_ordinary(text)),
+        cache=get_embedding_cache(),
+        scheduler=get_scheduler(),
+    )
@@ -0,0 +1,163 @@
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core import get_settings
+from app.services.single_flight import SingleFlight
+
+settings = get_settings()
+
+class DocumentMatrix:
+    """
+    One document's chunks, with their L2-normalized embeddings as a single
+    contiguous float32 matrix (one row per chunk, same order as chunks).
+    """
+
+    __slots__ = ("source_file", "chunks", "matrix", "nbytes")
+
+    def __init__(self, source_file: str, chunks: List[Dict[str, Any]], matrix):
+        import numpy as np
+
+        self.source_file = source_file
+        self.chunks = chunks
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.nbytes = self.matrix.nbytes + sum(len(chunk.get("content", "")) for chunk in chunks)
+
+    def top_k(self, queries: Sequence[Sequence[float]], k: int) -> List[List[Dict[str, Any]]]:
+        """Scores every query against every chunk in one matrix multiply; returns the k best rows per query."""
+        import numpy as np
+
+        if not len(self.chunks):
+            return [[] for _ in queries]
+
+        q = np.asarray(queries, dtype=np.float32)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q /= np.where(norms == 0, 1, norms)
+
+        scores = q @ self.matrix.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+
+        return [
+            [
+                {**self.chunks[index], "similarity": float(score)}
+                for index, score in zip(top[row][order[row]].tolist(), top_scores[row][order[row]].tolist())
+            ]
+            for row in range(len(q))
+        ]
+
+DocumentLoader = Callable[[str], Awaitable[Optional[Tuple[List[Dict[str, Any]], Any]]]]
+
+class HotDocumentCache:
+    """
+    LRU cache of DocumentMatrix objects, bounded by their total size in bytes.
+
+    Concurrent misses for the same document share one load. A document larger
+    than the whole budget is still returned to the caller, but not kept.
+
+    While a document is being written (between begin_write and end_write),
+    the store only holds some of its rows, so misses for it aren't loaded from
+    the store, and a load that overlapped a write isn't kept. Only the complete
+    copy the writer puts is cached, and it is pinned until the write ends:
+    requests answered from memory rely on it, so eviction skips it, even if
+    that leaves the cache over budget for a while.
+    """
+
+    def __init__(self, max_bytes: int, loader: DocumentLoader):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self._documents: "OrderedDict[str, DocumentMatrix]" = OrderedDict()
+        self._bytes = 0
+        self._flight = SingleFlight("hot-document")
+        self._writing: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def _load(self, source_file: str) -> Optional[DocumentMatrix]:
+        if source_file in self._writing:
+            return None
+
+        loaded = await self.loader(source_file)
+        if loaded is None:
+            return None
+        if source_file in self._writing:
+            # A write began during the load, which may have read only part of it
+            return DocumentMatrix(source_file, *loaded)
+
+        return self.put(source_file, *loaded)
+
+    def begin_write(self, source_file: str):
+        self._writing[source_file] = self._writing.get(source_file, 0) + 1
+
+    def end_write(self, source_file: str):
+        remaining = self._writing.get(source_file, 0) - 1
+        if remaining > 0:
+            self._writing[source_file] = remaining
+        else:
+            self._writing.pop(source_file, None)
+            self._evict()
+
+    def put(self, source_file: str, chunks: List[Dict[str, Any]], matrix) -> DocumentMatrix:
+        """Caches a document's chunks and normalized embeddings, replacing any cached copy."""
+        document = DocumentMatrix(source_file, chunks, matrix)
+        self.invalidate(source_file)
+        if document.nbytes <= self.max_bytes:
+            self._documents[source_file] = document
+            self._bytes += document.nbytes
+            self._evict()
+        else:
+            logging.info(f"{source_file} ({document.nbytes} bytes) is larger than the hot document cache")
+        return document
+
+    def _evict(self):
+        for source_file in list(self._documents):
+            if self._bytes <= self.max_bytes:
+                break
+            if source_file in self._writing:
+                continue
+            self._bytes -= self._documents.pop(source_file).nbytes
+            self.evictions += 1
+
+    def __contains__(self, source_file: str) -> bool:
+        return source_file in self._documents
+
+    async def get(self, source_file: str) -> Optional[DocumentMatrix]:
+        document = self._documents.get(source_file)
+        if document is not None:
+            self.hits += 1
+            self._documents.move_to_end(source_file)
+            return document
+
+        self.misses += 1
+        return await self._flight.run(source_file, lambda: self._load(source_file))
+
+    def invalidate(self, source_file: str):
+        document = self._documents.pop(source_file, None)
+        if document is not None:
+            self._bytes -= document.nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self._documents),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+@lru_cache()
+def get_hot_documents() -> Optional[HotDocumentCache]:
+    if not settings.hot_doc_cache_enabled:
+        return None
+
+    from app.services.vector_store import get_vector_store
+
+    return HotDocumentCache(
+        settings.hot_doc_cache_max_mb * 1024 * 1024,
+        lambda source_file: get_vector_store().load_document(source_file),
+    )
@@ -0,0 +1,77 @@
+import logging
+from typing import Optional, TYPE_CHECKING
+
+import httpx
+
+from app.core import get_settings
+
+if TYPE_CHECKING:
+    import aiohttp
+
+settings = get_settings()
+
+_http_client: Optional[httpx.AsyncClient] = None
+_download_session: Optional["aiohttp.ClientSession"] = None
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _create_http_client() -> httpx.AsyncClient:
+    http2 = settings.http2_enabled and _http2_available()
+    logging.info(f"Creating shared HTTP client (HTTP/2: {http2}, max connections: {settings.http_max_connections})")
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+        ),
+        timeout=httpx.Timeout(settings.http_timeout_seconds),
+    )
+
+def _create_download_session() -> "aiohttp.ClientSession":
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(
+        limit=settings.http_max_connections,
+        keepalive_timeout=settings.http_keepalive_expiry_seconds,
+        ttl_dns_cache=300,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+async def start_http_clients():
+    global _http_client, _download_session
+    if _http_client is None:
+        _http_client = _create_http_client()
+    if _download_session is None:
+        _download_session = _create_download_session()
+
+async def close_http_clients():
+    global _http_client, _download_session
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    if _download_session is not None:
+        await _download_session.close()
+        _download_session = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the pooled httpx client shared by the agent tools and API calls.
+    Created by the app lifespan; created on first use when running outside it.
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = _create_http_client()
+    return _http_client
+
+def get_download_session() -> "aiohttp.ClientSession":
+    """Returns the pooled aiohttp session used to download documents. Must be called from a running loop."""
+    global _download_session
+    if _download_session is None or _download_session.closed:
+        _download_session = _create_download_session()
+    return _download_session
@@ -0,0 +1,201 @@
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from app.utils import extract_text
+from app.utils.extract_text import extract_pdf_pages
+from app.utils.file_handling import DownloadedDocument, UrlValidators, download_document
+from app.services.vector_store_service import process_and_store_document
+from app.services.ingestion_pipeline import IngestionPipeline, pipeline_stats
+from app.services.single_flight import SingleFlight
+from app.services.write_behind import ingestion_writes
+from app.services.hot_documents import get_hot_documents
+from app.db.mongo import ingestion_leases, url_cache_collection
+from app.utils.executors import run_blocking
+from app.utils.timeline import stage
+from app.core import get_settings
+
+settings = get_settings()
+
+# Requests for the same URL share one download; downloads that turn out to be
+# the same file (by hash) share one extraction and embedding run.
+url_flight = SingleFlight("url")
+hash_flight = SingleFlight("hash")
+
+url_cache_stats = {"hits": 0, "misses": 0}
+
+# Files whose chunks are searchable in memory while still being written: hash -> filename
+searchable_in_memory: Dict[str, str] = {}
+
+async def _extract_and_store(document: DownloadedDocument, on_searchable: Callable[[], None]) -> Dict[str, Any]:
+    """Ingests the document; returns fields for its ready record."""
+    if settings.streaming_ingestion:
+        pipeline = IngestionPipeline(document.source, document.filename, on_searchable=on_searchable)
+        await pipeline.run()
+        boilerplate = pipeline.boilerplate_summary()
+    else:
+        with stage("extract"):
+            if document.filename.lower().endswith(".pdf"):
+                pdf = await run_blocking(extract_pdf_pages, document.source, pool="extract")
+                text, boilerplate = pdf.text, pdf.boilerplate
+            else:
+                text = await run_blocking(extract_text, document.source, filename=document.filename, pool="extract")
+                boilerplate = None
+        await process_and_store_document(text, document.filename, on_searchable=on_searchable)
+    logging.info("File Processed")
+
+    if boilerplate is None:
+        return {}
+    logging.info(
+        f"Stripped {boilerplate['removed_lines']} boilerplate lines from {document.filename}: "
+        f"{boilerplate['bytes_saved']} bytes, {boilerplate['tokens_saved']} tokens"
+    )
+    return {"boilerplate": boilerplate}
+
+async def _ingest_file(document: DownloadedDocument) -> str:
+    in_memory = searchable_in_memory.get(document.sha256) if settings.write_behind_enabled else None
+    hot_documents = get_hot_documents()
+    if in_memory is not None and hot_documents is not None and in_memory in hot_documents:
+        logging.info(f"File is still being written, answering from memory: {in_memory}")
+        return in_memory
+
+    searchable = asyncio.get_running_loop().create_future()
+
+    def on_searchable():
+        searchable_in_memory[document.sha256] = document.filename
+        if not searchable.done():
+            searchable.set_result(None)
+
+    # The lease makes sure only one worker across all processes ingests the file.
+    # It runs as a tracked background write: once the chunks are searchable in
+    # memory the request goes on, while the lease task keeps heartbeating until
+    # the rows and the ready record are written.
+    if hot_documents is not None:
+        hot_documents.begin_write(document.filename)
+    persisting = ingestion_writes.submit(document.sha256, ingestion_leases.run_once(
+        document.sha256,
+        document.filename,
+        lambda: _extract_and_store(document, on_searchable),
+        timeout=settings.ingestion_wait_timeout_seconds,
+    ))
+
+    def written(_):
+        searchable_in_memory.pop(document.sha256, None)
+        if hot_documents is not None:
+            hot_documents.end_write(document.filename)
+
+    persisting.add_done_callback(written)
+
+    if settings.write_behind_enabled:
+        await asyncio.wait({searchable, persisting}, return_when=asyncio.FIRST_COMPLETED)
+        if searchable.done():
+            logging.info(f"Answering from memory while {document.filename} is written in the background")
+            return document.filename
+
+    record = await asyncio.shield(persisting)
+    if record["filename"] != document.filename:
+        logging.info(f"File already processed: {record['filename']}")
+
+    return record["filename"]
+
+async def _cached_validators(url: str) -> Optional[Dict[str, Any]]:
+    if not settings.url_cache_enabled:
+        return None
+    try:
+        return await url_cache_collection.find_one({"url": url})
+    except Exception as e:
+        logging.error(f"URL cache lookup failed: {e}")
+        return None
+
+async def _remember_url(url: str, document: DownloadedDocument, filename: str):
+    validators = document.validators
+    if not settings.url_cache_enabled or not (validators.etag or validators.last_modified):
+        return
+    try:
+        await url_cache_collection.update_one(
+            {"url": url},
+            {"$set": {**validators.to_dict(), "hash": document.sha256, "filename": filename}},
+            upsert=True,
+        )
+    except Exception as e:
+        logging.error(f"URL cache update failed: {e}")
+
+async def _remember_url_after(persisting: asyncio.Task, url: str, document: DownloadedDocument, filename: str):
+    try:
+        await asyncio.shield(persisting)
+    except Exception:
+        return
+    await _remember_url(url, document, filename)
+
+async def _download_and_ingest(url: str) -> str:
+    cached = await _cached_validators(url)
+    cached_validators = UrlValidators(
+        etag=cached.get("etag"),
+        last_modified=cached.get("last_modified"),
+        content_length=cached.get("content_length"),
+    ) if cached else None
+
+    before_download = time.monotonic()
+    with stage("download"):
+        document = await download_document(url, cached_validators)
+    if document is None:
+        url_cache_stats["hits"] += 1
+        logging.info(f"Document unchanged since it was ingested as {cached['filename']}, skipping download")
+        return cached["filename"]
+
+    url_cache_stats["misses"] += 1
+    logging.info(f"Downloaded and hashed {document.size} bytes in {(time.monotonic()-before_download):.2f} seconds")
+
+    owned_by_flight = False
+
+    async def ingest() -> str:
+        try:
+            return await _ingest_file(document)
+        finally:
+            document.close()
+
+    def start_ingest():
+        # Called only if this request leads the hash flight; the shared task then
+        # owns the document and releases it, even if this request goes away.
+        nonlocal owned_by_flight
+        owned_by_flight = True
+        return ingest()
+
+    try:
+        filename = await hash_flight.run(document.sha256, start_ingest)
+
+        persisting = ingestion_writes.pending(document.sha256)
+        if persisting is None:
+            await _remember_url(url, document, filename)
+        else:
+            # Revalidation may skip ingestion entirely, so only remember the URL once the chunks are stored
+            ingestion_writes.submit(f"url:{url}", _remember_url_after(persisting, url, document, filename))
+        return filename
+    finally:
+        if not owned_by_flight:
+            document.close()
+
+async def ingest_document(url: str) -> str:
+    """
+    Makes sure the document at url is chunked and stored, downloading and
+    embedding it only if no identical file has been processed before.
+
+    Args:
+        url: URL of the document
+
+    Returns:
+        The source_file name its chunks are stored under
+    """
+    url = str(url)
+    return await url_flight.run(url, lambda: _download_and_ingest(url))
+
+def ingestion_stats() -> Dict[str, Any]:
+    return {
+        "url": url_flight.stats(),
+        "hash": hash_flight.stats(),
+        "coalesced": url_flight.coalesced + hash_flight.coalesced,
+        "url_cache": dict(url_cache_stats),
+        "write_behind": ingestion_writes.stats(),
+        "pipelines": pipeline_stats(),
+    }
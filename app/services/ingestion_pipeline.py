@@ -0,0 +1,354 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+from app.core import get_settings
+from app.services.chunker import TokenChunker
+from app.services.embeddings import get_batch_embedder
+from app.services.hot_documents import get_hot_documents
+from app.services.vector_store import get_vector_store
+from app.services.vector_store_service import (
+    ProcessedChunk,
+    get_title_and_summary,
+    insert_chunks,
+)
+from app.utils import extract_text
+from app.utils.boilerplate import BoilerplateReport
+from app.utils.extract_text import (
+    DocumentSource,
+    extract_pdf_page_range_stripped,
+    learn_pdf_boilerplate,
+    spill_source,
+)
+from app.utils.executors import get_process_pool, run_blocking
+from app.utils.timeline import stage
+
+settings = get_settings()
+
+_DONE = object()
+
+class StageStats:
+    def __init__(self, name: str, queue: Optional[asyncio.Queue] = None):
+        self.name = name
+        self.queue = queue
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.monotonic()
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "items": self.items,
+            "queue_depth": self.queue.qsize() if self.queue is not None else None,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_second": round(self.items / elapsed, 2) if elapsed else 0.0,
+        }
+
+async def _pdf_pages(source: DocumentSource, boilerplate_report: BoilerplateReport) -> AsyncIterator[str]:
+    """
+    Yields a PDF's text a window of pages at a time, extracting a few windows ahead on the process pool.
+
+    Header and footer lines learned from the first pages are stripped from
+    every window and recorded in boilerplate_report.
+    """
+    # Parsing a large PDF takes a while; keep it off the event loop
+    page_count, boilerplate = await run_blocking(learn_pdf_boilerplate, source, pool="extract")
+
+    def text_of(extracted) -> str:
+        pages, removed = extracted
+        boilerplate_report.add(removed)
+        return "".join(pages)
+
+    window = settings.pipeline_pages_per_window
+    ranges = [(start, min(start + window, page_count)) for start in range(0, page_count, window)]
+
+    if page_count < settings.pdf_parallel_min_pages:
+        for start, end in ranges:
+            yield text_of(await run_blocking(
+                extract_pdf_page_range_stripped, source, start, end, boilerplate, pool="extract"
+            ))
+        return
+
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    path = await run_blocking(spill_source, source, pool="io")
+    pending: List[asyncio.Future] = []
+    try:
+        for start, end in ranges:
+            pending.append(loop.run_in_executor(pool, extract_pdf_page_range_stripped, path, start, end, boilerplate))
+            if len(pending) > settings.process_pool_workers:
+                yield text_of(await pending.pop(0))
+        while pending:
+            yield text_of(await pending.pop(0))
+    finally:
+        for future in pending:
+            future.cancel()
+        if path is not source:
+            os.remove(path)
+
+async def _text_pieces(source: DocumentSource, filename: str, boilerplate_report: BoilerplateReport) -> AsyncIterator[str]:
+    if filename.lower().endswith(".pdf"):
+        async for piece in _pdf_pages(source, boilerplate_report):
+            yield piece
+        return
+
+    # Other formats aren't paged; they enter the pipeline as one piece
+    yield await run_blocking(extract_text, source, filename=filename, pool="extract")
+
+class IngestionPipeline:
+    """
+    Streams one document from extraction to the vector store through bounded queues.
+
+        extract (page windows) -> chunk -> embed (batches) -> write (bulk)
+
+    Every queue is bounded, so a slow stage holds back the ones before it and
+    memory stays flat however long the document is. Embedding starts with the
+    first pages instead of after the whole document is extracted. Each stage
+    reports items processed, time busy, throughput and its input queue depth.
+
+    If any stage fails, the others are cancelled, every row already written
+    for the document is removed, and the error is raised.
+    """
+
+    def __init__(self, source: DocumentSource, source_file: str, on_searchable: Optional[Callable[[], None]] = None):
+        self.source = source
+        self.source_file = source_file
+        self.on_searchable = on_searchable
+        self.boilerplate = BoilerplateReport()
+        size = settings.pipeline_queue_size
+        self.text_queue: asyncio.Queue = asyncio.Queue(size)
+        self.chunk_queue: asyncio.Queue = asyncio.Queue(size * settings.embedding_batch_items)
+        self.write_queue: asyncio.Queue = asyncio.Queue(size)
+        self.stats = {
+            "extract": StageStats("extract"),
+            "chunk": StageStats("chunk", self.text_queue),
+            "embed": StageStats("embed", self.chunk_queue),
+            "write": StageStats("write", self.write_queue),
+        }
+        # Kept for the hot document cache while the document still fits in it
+        hot_documents = get_hot_documents()
+        self._hot_budget = hot_documents.max_bytes if hot_documents is not None else 0
+        self._hot_rows: Optional[List[Dict[str, Any]]] = [] if hot_documents is not None else None
+        self._hot_vectors: List[Any] = []
+        self._hot_bytes = 0
+        # The insert in flight; it is left to finish on failure so cleanup runs after its rows land
+        self._inserting: Optional[asyncio.Future] = None
+
+    async def _extract(self):
+        stats = self.stats["extract"]
+        with stage("extract"):
+            pieces = _text_pieces(self.source, self.source_file, self.boilerplate)
+            try:
+                while True:
+                    started = time.monotonic()
+                    try:
+                        piece = await pieces.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    stats.busy_seconds += time.monotonic() - started
+                    stats.items += 1
+                    await self.text_queue.put(piece)
+            finally:
+                await pieces.aclose()
+        await self.text_queue.put(_DONE)
+
+    async def _chunk(self):
+        stats = self.stats["chunk"]
+        chunker = TokenChunker()
+        chunk_number = 0
+
+        while True:
+            piece = await self.text_queue.get()
+            started = time.monotonic()
+            chunks = await run_blocking(chunker.finish) if piece is _DONE else await run_blocking(chunker.feed, piece)
+            stats.busy_seconds += time.monotonic() - started
+
+            for chunk in chunks:
+                await self.chunk_queue.put((chunk_number, chunk))
+                chunk_number += 1
+                stats.items += 1
+            if piece is _DONE:
+                break
+        await self.chunk_queue.put(_DONE)
+
+    def _remember_for_hot_cache(self, processed: List[ProcessedChunk]):
+        if self._hot_rows is None:
+            return
+
+        import numpy as np
+
+        for chunk in processed:
+            vector = np.asarray(chunk.embedding, dtype=np.float32)
+            self._hot_bytes += vector.nbytes + len(chunk.content)
+            if self._hot_bytes > self._hot_budget:
+                # Too large for the cache; don't hold on to every vector
+                self._hot_rows, self._hot_vectors = None, []
+                return
+            self._hot_rows.append({
+                "source_file": chunk.source_file,
+                "chunk_number": chunk.chunk_number,
+                "title": chunk.title,
+                "summary": chunk.summary,
+                "content": chunk.content,
+            })
+            self._hot_vectors.append(vector)
+
+    async def _embed_batch(self, batch: List[tuple]):
+        stats = self.stats["embed"]
+        started = time.monotonic()
+        texts = [chunk for _, chunk in batch]
+        embeddings, extracted = await asyncio.gather(
+            get_batch_embedder().embed_many(texts),
+            asyncio.gather(*[get_title_and_summary(chunk) for chunk in texts]),
+        )
+        stats.busy_seconds += time.monotonic() - started
+        stats.items += len(batch)
+
+        processed = [
+            ProcessedChunk(
+                chunk_number=chunk_number,
+                title=details["title"],
+                summary=details["summary"],
+                content=chunk,
+                embedding=embedding,
+                source_file=self.source_file
+            )
+            for (chunk_number, chunk), details, embedding in zip(batch, extracted, embeddings)
+        ]
+        self._remember_for_hot_cache(processed)
+        await self.write_queue.put(processed)
+
+    async def _embed(self):
+        batch: List[tuple] = []
+        done = False
+        # Batches are embedded concurrently, up to the embedder's request limit;
+        # they may finish out of order, but chunk numbers carry the order
+        slots = asyncio.Semaphore(settings.embedding_max_in_flight)
+        running: Set[asyncio.Future] = set()
+
+        async def embed(batch: List[tuple]):
+            try:
+                await self._embed_batch(batch)
+            finally:
+                slots.release()
+
+        try:
+            with stage("embed_chunks"):
+                while not done:
+                    item = await self.chunk_queue.get()
+                    if item is _DONE:
+                        done = True
+                    else:
+                        batch.append(item)
+
+                    # Flush a full batch, or whatever has arrived once the chunker is idle,
+                    # so embedding keeps pace with extraction instead of waiting for a full batch
+                    if batch and (done or len(batch) >= settings.embedding_batch_items or self.chunk_queue.empty()):
+                        await slots.acquire()
+                        for task in [task for task in running if task.done()]:
+                            running.discard(task)
+                            task.result()  # raises if the batch failed
+                        running.add(asyncio.ensure_future(embed(batch)))
+                        batch = []
+
+                await asyncio.gather(*running)
+        finally:
+            for task in running:
+                task.cancel()
+
+        await self.write_queue.put(_DONE)
+        self._publish_to_hot_cache()
+
+    def _publish_to_hot_cache(self):
+        hot_documents = get_hot_documents()
+        if hot_documents is None or self._hot_rows is None or not self._hot_rows:
+            return
+
+        import numpy as np
+
+        order = sorted(range(len(self._hot_rows)), key=lambda i: self._hot_rows[i]["chunk_number"])
+        matrix = np.vstack([self._hot_vectors[i] for i in order])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        hot_documents.put(self.source_file, [self._hot_rows[i] for i in order], matrix)
+        self._hot_rows, self._hot_vectors = None, []
+
+        if self.source_file in hot_documents and self.on_searchable is not None:
+            self.on_searchable()
+
+    async def _write(self):
+        stats = self.stats["write"]
+        pending: List[ProcessedChunk] = []
+        with stage("store_chunks"):
+            while True:
+                item = await self.write_queue.get()
+                done = item is _DONE
+                if not done:
+                    pending.extend(item)
+
+                while len(pending) >= settings.insert_batch_rows or (done and pending):
+                    batch, pending = pending[:settings.insert_batch_rows], pending[settings.insert_batch_rows:]
+                    started = time.monotonic()
+                    self._inserting = asyncio.ensure_future(insert_chunks(batch))
+                    await asyncio.shield(self._inserting)
+                    stats.busy_seconds += time.monotonic() - started
+                    stats.items += len(batch)
+
+                if done:
+                    break
+
+    async def run(self) -> Dict[str, Any]:
+        started = time.monotonic()
+        tasks = [
+            asyncio.ensure_future(self._extract()),
+            asyncio.ensure_future(self._chunk()),
+            asyncio.ensure_future(self._embed()),
+            asyncio.ensure_future(self._write()),
+        ]
+        active_pipelines.add(self)
+        try:
+            # Fail as soon as any stage fails instead of leaving the others blocked on queues
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._clean_up()
+            raise
+        finally:
+            active_pipelines.discard(self)
+
+        summary = {name: stats.as_dict() for name, stats in self.stats.items()}
+        logging.info(f"Ingested {self.source_file} in {time.monotonic() - started:.2f}s through the pipeline: {summary}")
+        return summary
+
+    def boilerplate_summary(self) -> Optional[Dict[str, Any]]:
+        """What boilerplate was stripped from the document, if any."""
+        return self.boilerplate.as_dict() if self.boilerplate.removed_lines else None
+
+    async def _clean_up(self):
+        if self._inserting is not None:
+            # Cancelling the write stage doesn't stop its insert, whose rows would
+            # otherwise arrive after the document was deleted
+            await asyncio.gather(self._inserting, return_exceptions=True)
+
+        hot_documents = get_hot_documents()
+        if hot_documents is not None:
+            hot_documents.invalidate(self.source_file)
+        try:
+            await get_vector_store().delete_document(self.source_file)
+        except Exception as e:
+            logging.error(f"Could not remove partially ingested {self.source_file}: {e}")
+
+active_pipelines: Set[IngestionPipeline] = set()
+
+def pipeline_stats() -> List[Dict[str, Any]]:
+    return [
+        {"source_file": pipeline.source_file, **{name: stats.as_dict() for name, stats in pipeline.stats.items()}}
+        for pipeline in active_pipelines
+    ]
@@ -1,58 +1,121 @@
 from dotenv import load_dotenv
-from google.genai import types
-from google import genai
-import requests
+from functools import lru_cache
+from typing import Awaitable, Dict, List, Optional, Set, TYPE_CHECKING
+import asyncio
 import logging
-import httpx
 import io
 
 from app.services.vector_store_service import (
-    supabase,
-    openai_client,
+    get_openai_client,
     get_embedding
 )
+from app.services.vector_store import get_vector_store
+from app.services.embeddings import get_batch_embedder
+from app.services.hot_documents import get_hot_documents
+from app.services.scheduler import INTERACTIVE
+from app.utils.executors import run_blocking
+from app.utils.timeline import stage
 from app.services.agent import (
     ApiDependencies,
-    agent
+    get_agent
 )
 from app.utils import (
     RAG_AGENT_SYSTEM_PROMPT,
-    PDF_AGENT_PROMPT
+    PDF_AGENT_PROMPT,
+    BATCH_RAG_PROMPT
 )
-from app.services.round_robin import RoundRobin
+from app.core import get_settings
+from app.services.http_clients import get_http_client
+from app.services.scheduler import estimate_tokens, get_scheduler
+
+if TYPE_CHECKING:
+    from google import genai
 
 load_dotenv()
-client = genai.Client()
+settings = get_settings()
 
-async def retrieve_relevant_pdf_chunks(user_query: str, source_file: str = "") -> str:
+# Model behind the agent and the direct genai calls; rate limits are tracked under this name
+LLM_MODEL = "gemini-2.5-pro"
+
+@lru_cache()
+def get_genai_client() -> "genai.Client":
+    from google import genai
+
+    return genai.Client()
+
+# Keeps references to in-flight batch runs so they aren't garbage collected.
+_batch_tasks: Set[asyncio.Task] = set()
+
+RETRIEVE_COUNT = 3
+
+async def retrieve_chunk_rows(user_query: str, source_file: str = "") -> List[Dict]:
     embedding = await get_embedding(user_query)
-    retrieve = 3
+    retrieve = RETRIEVE_COUNT
      
     # if source_file.split('.')[-1] == 'xlsx':
     #     retrieve = 1
     # print(retrieve)
-    result = supabase.rpc(
-        'match_pdf_chunks',
-        {
-            'query_embedding': embedding,
-            'match_count': retrieve,
-            'source': source_file
-        }
-    ).execute()
-
-    if not result.data:
+    return await get_vector_store().search(embedding, source_file or "", retrieve)
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.split())
+
+async def embed_questions(user_queries: List[str]) -> List[List[float]]:
+    """Embeds all questions of a request in one request; they don't depend on the document."""
+    with stage("embed_questions"):
+        return await get_batch_embedder().embed_many(
+            [normalize_question(query) for query in user_queries],
+            priority=INTERACTIVE,
+        )
+
+async def retrieve_chunk_rows_many(
+    user_queries: List[str],
+    source_file: str,
+    embeddings: Optional[Awaitable[List[List[float]]]] = None,
+) -> List[List[Dict]]:
+    """
+    Retrieves chunks for every question of a request at once: one embedding
+    request for all questions and, when the document is in the hot document
+    cache, one matrix multiply against it instead of a search per question.
+
+    Args:
+        embeddings: Question embeddings already being computed, e.g. started
+            before the document was ingested
+    """
+    if embeddings is None:
+        embeddings = embed_questions(user_queries)
+
+    hot_documents = get_hot_documents()
+    document = None
+    if hot_documents is not None and source_file:
+        document, vectors = await asyncio.gather(hot_documents.get(source_file), embeddings)
+    else:
+        vectors = await embeddings
+
+    with stage("retrieve"):
+        if document is None:
+            return await asyncio.gather(*[
+                get_vector_store().search(vector, source_file or "", RETRIEVE_COUNT) for vector in vectors
+            ])
+        return await run_blocking(document.top_k, vectors, RETRIEVE_COUNT)
+
+def format_chunk_rows(rows: List[Dict]) -> str:
+    if not rows:
         return "No relevant chunks found."
 
-    result = "\n\n---\n\n".join([
-        f"{r['content']}" for r in result.data
+    return "\n\n---\n\n".join([
+        f"{r['content']}" for r in rows
     ])
 
-    return result
+async def retrieve_relevant_pdf_chunks(user_query: str, source_file: str = "") -> str:
+    rows = await retrieve_chunk_rows(user_query, source_file)
+    return format_chunk_rows(rows)
 
-async def answer_query(user_query: str, source_file: str = None) -> str:
+async def answer_query(user_query: str, source_file: str = None, context: Optional[str] = None) -> str:
     try:
-        if source_file:
-            context = await retrieve_relevant_pdf_chunks(user_query, source_file)
+        if source_file or context is not None:
+            if context is None:
+                context = await retrieve_relevant_pdf_chunks(user_query, source_file)
             prompt = f"Retrieved Chunks: {context}. \n User Query: {user_query}."
         else: 
             prompt = user_query
@@ -68,13 +131,17 @@ async def answer_query(user_query: str, source_file: str = None) -> str:
         # content = response.choices[0].message.content
         # return content
 
-        async with httpx.AsyncClient() as client:
-            api_deps = ApiDependencies(http_client=client)
-            result = await agent.run(prompt, deps=api_deps)
+        api_deps = ApiDependencies(http_client=get_http_client())
+        result = await get_scheduler().call(
+            LLM_MODEL,
+            lambda: get_agent().run(prompt, deps=api_deps),
+            tokens=estimate_tokens(prompt),
+        )
 
-            return result.output
+        return result.output
 
         # import os
+        # from app.services.round_robin import RoundRobin
         # keys = []
         # for i in range(3):
         #     keys.append(os.getenv(f"KEY{i + 1}"))
@@ -86,16 +153,43 @@ async def answer_query(user_query: str, source_file: str = None) -> str:
     except Exception as e:
         logging.error(f"Error getting answer: {e}")
 
-def read_image(url: str = None, image_bytes = None, mime_type: str = "image/jpeg") -> str:
-    if url: image_bytes = requests.get(url).content
+IMAGE_DESCRIPTION_PROMPT = "Give all the details of the image in text, so that the other agent can answer questions on the image based on the text you give."
+
+def describe_image(image_bytes: bytes, mime_type: str = "image/jpeg") -> str:
+    """Blocking variant of read_image for code already running off the event loop."""
+    from google.genai import types
+
     image = types.Part.from_bytes(
         data=image_bytes, 
         mime_type=mime_type
     )
 
-    response = client.models.generate_content(
+    response = get_genai_client().models.generate_content(
         model="gemini-2.5-pro",
-        contents=["Give all the details of the image in text, so that the other agent can answer questions on the image based on the text you give.", image],
+        contents=[IMAGE_DESCRIPTION_PROMPT, image],
+    )
+
+    return response.text
+
+async def read_image(url: str = None, image_bytes = None, mime_type: str = "image/jpeg") -> str:
+    from google.genai import types
+
+    if url:
+        response = await get_http_client().get(str(url), follow_redirects=True)
+        response.raise_for_status()
+        image_bytes = response.content
+    image = types.Part.from_bytes(
+        data=image_bytes, 
+        mime_type=mime_type
+    )
+
+    response = await get_scheduler().call(
+        LLM_MODEL,
+        lambda: get_genai_client().aio.models.generate_content(
+            model=LLM_MODEL,
+            contents=[IMAGE_DESCRIPTION_PROMPT, image],
+        ),
+        tokens=estimate_tokens(IMAGE_DESCRIPTION_PROMPT) + 1000,
     )
 
     print(response.text)
@@ -106,12 +200,16 @@ async def answer_image_query(user_query: str, image_text: str) -> str:
         system_prompt = """ You are tasked to answer the question asked by the user on the basis of the image given. The image model has convertad the image into text describing the image. You will receive that description along with the query. You need to answer user's query in short. Your answer should be short and to the point. If the image does not contain answer of the query, then answer it correctly by your own. Try to identidy patterns from the image before answering by your own.  """
         prompt = f"Text description of the image given by user: {image_text}. \n User Query: {user_query}."
 
-        response = await openai_client.chat.completions.create(
-            model="gemini-2.5-pro",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ]
+        response = await get_scheduler().call(
+            LLM_MODEL,
+            lambda: get_openai_client().chat.completions.create(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ]
+            ),
+            tokens=estimate_tokens(system_prompt, prompt),
         )
 
         content = response.choices[0].message.content
@@ -120,28 +218,194 @@ async def answer_image_query(user_query: str, image_text: str) -> str:
         logging.error(f"Error getting answer: {e}")
 
 async def pdf_query(url: str, questions: list) -> list:
-    doc_io = io.BytesIO(httpx.get(url).content)
+    doc_io = io.BytesIO((await get_http_client().get(url)).content)
 
-    sample_doc = client.files.upload(
+    client = get_genai_client()
+    sample_doc = await client.aio.files.upload(
     file=doc_io,
     config=dict(
         mime_type='application/pdf')
     )
-    response = client.models.generate_content(
-        model="gemini-2.5-pro",
-        contents=[
-            sample_doc, 
-            PDF_AGENT_PROMPT(questions)
-        ],
-        config={
-            "response_mime_type": "application/json",
-            "response_schema": list[str],
-        },
+    prompt = PDF_AGENT_PROMPT(questions)
+    response = await get_scheduler().call(
+        LLM_MODEL,
+        lambda: client.aio.models.generate_content(
+            model=LLM_MODEL,
+            contents=[
+                sample_doc, 
+                prompt
+            ],
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": list[str],
+            },
+        ),
+        # The uploaded PDF counts too, but its size in tokens isn't known here
+        tokens=estimate_tokens(prompt) + 10000,
     )
 
     answers = response.parsed
     return answers
 
+def answer_queries(
+    questions: List[str],
+    source_file: str,
+    question_embeddings: Optional[Awaitable[List[List[float]]]] = None,
+) -> List[Awaitable[str]]:
+    """
+    Answers each question with its own LLM call, after one shared retrieval
+    for all of them. Returns one awaitable per question, in order.
+    """
+    retrieval = asyncio.ensure_future(retrieve_chunk_rows_many(questions, source_file, question_embeddings))
+
+    async def answer(i: int, question: str) -> str:
+        try:
+            rows = (await asyncio.shield(retrieval))[i]
+        except Exception as e:
+            logging.error(f"Shared retrieval failed, retrieving for the question alone: {e}")
+            return await answer_query(question, source_file)
+        return await answer_query(question, context=format_chunk_rows(rows))
+
+    return [answer(i, question) for i, question in enumerate(questions)]
+
+def _chunk_key(row: Dict):
+    return row.get("id", (row.get("source_file"), row.get("chunk_number")))
+
+def group_questions_by_overlap(chunk_keys: List[Set], max_group_size: int) -> List[List[int]]:
+    """
+    Greedily groups question indices whose retrieved chunk sets share at least
+    one chunk, capping each group at max_group_size questions.
+    """
+    groups: List[List[int]] = []
+    group_keys: List[Set] = []
+
+    for i, keys in enumerate(chunk_keys):
+        for group, seen in zip(groups, group_keys):
+            if len(group) < max_group_size and seen & keys:
+                group.append(i)
+                seen |= keys
+                break
+        else:
+            groups.append([i])
+            group_keys.append(set(keys))
+
+    return groups
+
+async def _answer_group(questions: List[str], rows_per_question: List[List[Dict]]) -> List[str]:
+    if len(questions) == 1:
+        return [await answer_query(questions[0], context=format_chunk_rows(rows_per_question[0]))]
+
+    unique_rows = {}
+    for rows in rows_per_question:
+        for row in rows:
+            unique_rows.setdefault(_chunk_key(row), row)
+    context = format_chunk_rows(list(unique_rows.values()))
+
+    try:
+        prompt = BATCH_RAG_PROMPT(questions, context)
+        response = await get_scheduler().call(
+            LLM_MODEL,
+            lambda: get_genai_client().aio.models.generate_content(
+                model=LLM_MODEL,
+                contents=prompt,
+                config={
+                    "response_mime_type": "application/json",
+                    "response_schema": list[str],
+                },
+            ),
+            tokens=estimate_tokens(prompt),
+        )
+        answers = response.parsed
+        if isinstance(answers, list) and len(answers) == len(questions):
+            return answers
+        logging.warning(f"Batched answer count mismatch ({answers and len(answers)} for {len(questions)} questions), answering individually")
+    except Exception as e:
+        logging.error(f"Batched answering failed, answering individually: {e}")
+
+    return await asyncio.gather(*[
+        answer_query(question, context=format_chunk_rows(rows))
+        for question, rows in zip(questions, rows_per_question)
+    ])
+
+async def _run_batches(
+    questions: List[str],
+    source_file: str,
+    futures: List[asyncio.Future],
+    question_embeddings: Optional[Awaitable[List[List[float]]]] = None,
+):
+    try:
+        rows_per_question = await retrieve_chunk_rows_many(questions, source_file, question_embeddings)
+    except Exception as e:
+        # Like answer_queries: fall back to answering each question alone
+        logging.error(f"Shared retrieval failed, answering each question alone: {e}")
+
+        async def answer_alone(i: int):
+            answer = await answer_query(questions[i], source_file)
+            if not futures[i].done():
+                futures[i].set_result(answer)
+
+        await asyncio.gather(*[answer_alone(i) for i, future in enumerate(futures) if not future.done()])
+        return
+
+    try:
+        groups = group_questions_by_overlap(
+            [{_chunk_key(row) for row in rows} for rows in rows_per_question],
+            settings.rag_batch_max_questions
+        )
+        logging.info(f"Answering {len(questions)} questions in {len(groups)} batched calls")
+
+        async def run_group(group: List[int]):
+            try:
+                answers = await _answer_group(
+                    [questions[i] for i in group],
+                    [rows_per_question[i] for i in group]
+                )
+                for i, answer in zip(group, answers):
+                    # Cancelled if the client went away
+                    if not futures[i].done():
+                        futures[i].set_result(answer)
+            except Exception as e:
+                for i in group:
+                    if not futures[i].done():
+                        futures[i].set_exception(e)
+
+        await asyncio.gather(*[run_group(group) for group in groups])
+    except Exception as e:
+        logging.error(f"Error grouping questions for batched answering: {e}")
+        for future in futures:
+            if not future.done():
+                future.set_exception(e)
+
+def answer_queries_batched(
+    questions: List[str],
+    source_file: str,
+    question_embeddings: Optional[Awaitable[List[List[float]]]] = None,
+) -> List[Awaitable[str]]:
+    """
+    Answers questions about one document with one structured LLM call per group
+    of questions whose retrieved chunks overlap.
+
+    Returns one awaitable per question, in order. Each resolves as soon as the
+    call for its group completes, so callers can still stream answers. Once
+    every awaitable is cancelled, e.g. because the client disconnected, the
+    calls are cancelled too.
+    """
+    loop = asyncio.get_running_loop()
+    futures = [loop.create_future() for _ in questions]
+
+    task = asyncio.create_task(_run_batches(questions, source_file, futures, question_embeddings))
+    _batch_tasks.add(task)
+    task.add_done_callback(_batch_tasks.discard)
+
+    def cancel_when_abandoned(_):
+        if all(future.cancelled() for future in futures):
+            task.cancel()
+
+    for future in futures:
+        future.add_done_callback(cancel_when_abandoned)
+
+    return futures
+
 async def main():
     result = await answer_query("How are you?")
     print(result)
@@ -9,6 +9,7 @@ import httpx
 import time
 
 from app.utils import RAG_AGENT_SYSTEM_PROMPT
+from app.services.http_clients import get_http_client
 
 load_dotenv()
 
@@ -47,22 +48,21 @@ def get_agent(api_key: str):
         try:
             logging.info(f"Calling API request tool. URL: {url} Method: {method} Payload: {payload}")
 
-            async with httpx.AsyncClient() as client:
-                response = await client.request(
-                    method=method,
-                    url=url,
-                    json=payload if payload else None,
-                    follow_redirects=True,
-                    timeout=10.0,
-                )
-                response.raise_for_status()
+            response = await get_http_client().request(
+                method=method,
+                url=url,
+                json=payload if payload else None,
+                follow_redirects=True,
+                timeout=10.0,
+            )
+            response.raise_for_status()
 
-                logging.info(f"{response.text}")
+            logging.info(f"{response.text}")
 
-                if response.status_code!= 204:
-                    return response.text
-                else:
-                    return {"status": "success", "code": response.status_code}
+            if response.status_code!= 204:
+                return response.text
+            else:
+                return {"status": "success", "code": response.status_code}
         except httpx.HTTPStatusError as e:
             error_body = e.response.text
             logging.error(error_body)
@@ -0,0 +1,283 @@
+import json
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+
+from app.core import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+# Query answering must never wait behind a document being embedded
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+class ModelCallError(RuntimeError):
+    pass
+
+def estimate_tokens(*texts: str) -> int:
+    return sum(len(text) for text in texts) // 4 + 1
+
+def _status_code(error: Exception) -> Optional[int]:
+    for candidate in (
+        getattr(error, "status_code", None),
+        getattr(error, "code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+    ):
+        if isinstance(candidate, int):
+            return candidate
+    return None
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    # openai's connection and timeout errors, without importing openai here
+    if type(error).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS
+
+class TokenBucket:
+    """
+    Refills at per_minute / 60 units a second up to capacity. reserve() takes
+    the units immediately, possibly going into debt, and returns how long the
+    caller has to wait; callers are therefore served in the order they ask.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+    def pause(self, seconds: float):
+        # Nothing goes out until the server's Retry-After has passed
+        self._refill()
+        self.level = min(self.level, -seconds * self.rate)
+
+class ModelLimiter:
+    """Rate limits, concurrency slots and priority queues for one model."""
+
+    def __init__(self, model: str, rpm: float, tpm: float, max_concurrency: int, bulk_share: float):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        # Bulk work also draws from its own smaller buckets, so it can use at most
+        # bulk_share of the rate limits and never run the shared ones into debt
+        # that queries would have to wait out
+        self.bulk_requests = TokenBucket(rpm * bulk_share)
+        self.bulk_tokens = TokenBucket(tpm * bulk_share)
+        self.max_concurrency = max_concurrency
+        # Bulk work leaves some slots free so queries can start right away
+        self.bulk_limit = max(1, min(max_concurrency, int(max_concurrency * bulk_share)))
+        self.active = {INTERACTIVE: 0, BULK: 0}
+        self.waiters: Dict[str, Deque[asyncio.Future]] = {INTERACTIVE: deque(), BULK: deque()}
+        self.calls = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self.failures = 0
+
+    def _can_start(self, priority: str) -> bool:
+        if sum(self.active.values()) >= self.max_concurrency:
+            return False
+        if priority == BULK:
+            return self.active[BULK] < self.bulk_limit and not self.waiters[INTERACTIVE]
+        return True
+
+    async def acquire(self, priority: str):
+        if not self.waiters[priority] and self._can_start(priority):
+            self.active[priority] += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[priority].append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation
+                self.release(priority)
+            else:
+                try:
+                    self.waiters[priority].remove(future)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self, priority: str):
+        self.active[priority] -= 1
+        for waiting in (INTERACTIVE, BULK):
+            queue = self.waiters[waiting]
+            while queue and self._can_start(waiting):
+                future = queue.popleft()
+                if future.done():
+                    continue
+                self.active[waiting] += 1
+                future.set_result(None)
+
+    async def _throttle(self, wait: float):
+        if wait > 0:
+            self.throttled_seconds += wait
+            await asyncio.sleep(wait)
+
+    async def wait_for_budget(self, tokens: int, priority: str = INTERACTIVE):
+        if priority == BULK:
+            # Only take from the shared buckets once the bulk share allows it
+            await self._throttle(max(self.bulk_requests.reserve(1), self.bulk_tokens.reserve(tokens)))
+        await self._throttle(max(self.requests.reserve(1), self.tokens.reserve(tokens)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "active": dict(self.active),
+            "queued": {priority: len(queue) for priority, queue in self.waiters.items()},
+        }
+
+class ModelScheduler:
+    """
+    Single gate for outbound model calls.
+
+    Each model gets request-per-minute and token-per-minute buckets, a cap on
+    concurrent calls and two queues. Interactive calls always go first, and
+    bulk calls may only use part of the slots and part of the rate limits.
+    Calls wait for rate budget before taking a slot, so a throttled call never
+    holds one. Retryable failures (429, 5xx, timeouts, dropped connections)
+    are retried with jittered exponential backoff. A Retry-After from the
+    server is honored and pauses every call to that model. Whatever still
+    fails is raised as ModelCallError.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, float]]] = None,
+        default_rpm: float = 1000,
+        default_tpm: float = 4_000_000,
+        default_concurrency: int = 16,
+        bulk_share: float = 0.75,
+        max_retries: int = 5,
+    ):
+        self.limits = limits or {}
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.default_concurrency = default_concurrency
+        self.bulk_share = bulk_share
+        self.max_retries = max_retries
+        self._limiters: Dict[str, ModelLimiter] = {}
+
+    def limiter(self, model: str) -> ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limits = self.limits.get(model, {})
+            limiter = ModelLimiter(
+                model,
+                rpm=limits.get("rpm", self.default_rpm),
+                tpm=limits.get("tpm", self.default_tpm),
+                max_concurrency=int(limits.get("concurrency", self.default_concurrency)),
+                bulk_share=self.bulk_share,
+            )
+            self._limiters[model] = limiter
+        return limiter
+
+    async def call(
+        self,
+        model: str,
+        fn: Callable[[], Awaitable[T]],
+        tokens: int = 1,
+        priority: str = INTERACTIVE,
+        max_retries: Optional[int] = None,
+    ) -> T:
+        """
+        Runs fn once a slot and rate budget for model are available.
+
+        Args:
+            model: Model the call goes to; limits are tracked per model
+            fn: Makes the call; invoked again on every retry
+            tokens: Estimated tokens the call consumes
+            priority: INTERACTIVE for query traffic, BULK for ingestion
+            max_retries: Overrides the scheduler's retry count
+        """
+        limiter = self.limiter(model)
+        retries = self.max_retries if max_retries is None else max_retries
+
+        for attempt in range(retries + 1):
+            await limiter.wait_for_budget(tokens, priority)
+            await limiter.acquire(priority)
+            try:
+                limiter.calls += 1
+                return await fn()
+            except Exception as e:
+                if attempt == retries or not is_retryable(e):
+                    limiter.failures += 1
+                    raise ModelCallError(f"{model} call failed after {attempt + 1} attempts: {e}") from e
+
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    limiter.requests.pause(retry_after)
+                delay = retry_after if retry_after is not None else min(30.0, 2 ** attempt) * (0.5 + random.random())
+                logging.warning(f"{model} call failed ({e}), retrying in {delay:.1f}s (attempt {attempt + 1}/{retries + 1})")
+            finally:
+                limiter.release(priority)
+
+            limiter.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {model: limiter.stats() for model, limiter in self._limiters.items()}
+
+@lru_cache()
+def get_scheduler() -> ModelScheduler:
+    limits = {}
+    if settings.model_rate_limits:
+        try:
+            limits = json.loads(settings.model_rate_limits)
+        except ValueError as e:
+            logging.error(f"Ignoring invalid MODEL_RATE_LIMITS: {e}")
+
+    return ModelScheduler(
+        limits=limits,
+        default_rpm=settings.scheduler_default_rpm,
+        default_tpm=settings.scheduler_default_tpm,
+        default_concurrency=settings.scheduler_default_concurrency,
+        bulk_share=settings.scheduler_bulk_share,
+        max_retries=settings.scheduler_max_retries,
+    )
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls for the same key within this process.
+
+    The first caller for a key runs the work; callers arriving while it is in
+    flight await the same result (or exception) instead of repeating it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        existing = self._inflight.get(key)
+        if existing is not None:
+            self.coalesced += 1
+            logging.info(f"[{self.name}] Joining in-flight work for {key}")
+            # Shield so a disconnecting follower doesn't cancel the shared work
+            return await asyncio.shield(existing)
+
+        # Run as a separate task so the work survives the leader being cancelled
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        self.started += 1
+        task.add_done_callback(lambda t: self._finish(key, t))
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            self.failed += 1
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "in_flight": self.in_flight(),
+        }
@@ -0,0 +1,562 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, TYPE_CHECKING
+
+from app.core import get_settings
+from app.utils.executors import run_blocking
+
+settings = get_settings()
+
+if TYPE_CHECKING:
+    from app.services.ann_index import HnswIndex
+
+# Columns of a pdf_chunks row other than the embedding
+CHUNK_FIELDS = ("source_file", "chunk_number", "title", "summary", "content")
+
+class VectorStore(ABC):
+    """
+    Where chunk embeddings are stored and searched.
+
+    Rows are pdf_chunks rows: source_file, chunk_number, title, summary,
+    content and embedding. Search results carry the same fields minus the
+    embedding, plus similarity, best match first.
+    """
+
+    name: str
+
+    @abstractmethod
+    async def upsert(self, rows: List[Dict[str, Any]]) -> Dict[str, float]:
+        """Stores rows, replacing any with the same (source_file, chunk_number)."""
+
+    @abstractmethod
+    async def delete_document(self, source_file: str):
+        """Removes every row of source_file."""
+
+    @abstractmethod
+    async def search(self, embedding: Sequence[float], source_file: str = "", k: int = 3) -> List[Dict[str, Any]]:
+        """Returns the k rows most similar to embedding; source_file "" searches all documents."""
+
+    async def load_document(self, source_file: str):
+        """
+        Returns (chunks, matrix) for every chunk of source_file: the rows without
+        embeddings, in chunk order, and a float32 matrix of their L2-normalized
+        embeddings. Returns None if the document has no chunks.
+        """
+        return None
+
+    def warmup(self):
+        """Loads clients or libraries ahead of the first request."""
+
+    def close(self):
+        """Flushes anything kept in memory; called on shutdown."""
+
+class SupabaseVectorStore(VectorStore):
+    """pdf_chunks in Supabase, searched with the match_pdf_chunks RPC."""
+
+    name = "supabase"
+
+    def __init__(self, batch_rows: int = 100, max_in_flight: int = 4, max_retries: int = 2):
+        self.batch_rows = batch_rows
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+
+    def _client(self):
+        from app.services.vector_store_service import get_supabase
+        return get_supabase()
+
+    def warmup(self):
+        self._client()
+
+    async def _upsert_rows(self, rows: List[Dict[str, Any]]):
+        # Upserting on the table's unique key keeps retried batches from duplicating rows
+        await run_blocking(
+            self._client().table("pdf_chunks").upsert(rows, on_conflict="source_file,chunk_number").execute
+        )
+
+    async def _write_batch(self, rows: List[Dict[str, Any]], stats: Dict[str, float], retries: int):
+        for attempt in range(retries + 1):
+            stats["requests"] += 1
+            try:
+                await self._upsert_rows(rows)
+                stats["rows"] += len(rows)
+                return
+            except Exception as e:
+                logging.warning(f"Inserting {len(rows)} chunks failed (attempt {attempt + 1}): {e}")
+                if attempt < retries:
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+                elif len(rows) == 1:
+                    raise
+
+        # Too large a payload or one bad row fails the whole batch; halving isolates both.
+        # The halves are not retried again, so an unreachable database still fails fast.
+        stats["splits"] += 1
+        middle = len(rows) // 2
+        await self._write_batch(rows[:middle], stats, retries=0)
+        await self._write_batch(rows[middle:], stats, retries=0)
+
+    async def upsert(self, rows: List[Dict[str, Any]]) -> Dict[str, float]:
+        """
+        Writes rows in batches of batch_rows, with at most max_in_flight batches
+        in flight. Failed batches are retried, then split. If a batch still
+        can't be written, every row already written for those documents is
+        removed, so a failed ingestion leaves no partial document behind, and
+        the error is raised.
+        """
+        batches = [rows[i:i + self.batch_rows] for i in range(0, len(rows), self.batch_rows)]
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        stats = {"rows": 0, "batches": len(batches), "requests": 0, "splits": 0}
+
+        async def write(batch: List[Dict[str, Any]]):
+            async with semaphore:
+                await self._write_batch(batch, stats, self.max_retries)
+
+        # Every batch has to settle before cleaning up; a batch still in flight
+        # would otherwise land its rows after the document was deleted
+        results = await asyncio.gather(*[write(batch) for batch in batches], return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            for source_file in {row["source_file"] for row in rows}:
+                try:
+                    await self.delete_document(source_file)
+                except Exception as e:
+                    logging.error(f"Could not remove partially inserted chunks of {source_file}: {e}")
+            raise errors[0]
+
+        return stats
+
+    async def delete_document(self, source_file: str):
+        await run_blocking(self._client().table("pdf_chunks").delete().eq("source_file", source_file).execute)
+
+    async def search(self, embedding: Sequence[float], source_file: str = "", k: int = 3) -> List[Dict[str, Any]]:
+        result = await run_blocking(self._client().rpc(
+            'match_pdf_chunks',
+            {
+                'query_embedding': list(embedding),
+                'match_count': k,
+                'source': source_file
+            }
+        ).execute)
+
+        return result.data or []
+
+    def _load_document(self, source_file: str, page_size: int = 1000):
+        import numpy as np
+
+        rows = []
+        # PostgREST caps rows per response, so read the document in pages
+        while True:
+            page = self._client().table("pdf_chunks") \
+                .select("id,source_file,chunk_number,title,summary,content,embedding") \
+                .eq("source_file", source_file) \
+                .order("chunk_number") \
+                .range(len(rows), len(rows) + page_size - 1) \
+                .execute().data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+
+        if not rows:
+            return None
+
+        embeddings = [row.pop("embedding") for row in rows]
+        # pgvector columns come back as their text form, "[0.1,0.2,...]"
+        matrix = np.array([
+            json.loads(embedding) if isinstance(embedding, str) else embedding
+            for embedding in embeddings
+        ], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        return rows, matrix
+
+    async def load_document(self, source_file: str):
+        return await run_blocking(self._load_document, source_file)
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process store for running and load-testing without Supabase.
+
+    Each document gets a directory under root holding segments: a .npy
+    float32 matrix of L2-normalized embeddings (one row per chunk) and a JSON
+    file with the other columns of each row. chunks.json lists the segments.
+    An upsert writes its rows as a new segment instead of rewriting the
+    document, merging it into the newest segments while they are no larger,
+    so a document has a logarithmic number of segments and streaming its
+    batches in costs O(n log n) I/O. Matrices are opened memory-mapped and
+    searched segment by segment, so only the pages a search touches are read
+    and nothing is copied. Cosine similarity is then a matrix-vector product.
+    The segments of the max_open_documents most recently used documents stay
+    open.
+
+    With an ANN index, searches across all documents go through the index
+    instead of scanning every matrix. Searches within one document stay
+    exact, since a single document's matrix is small. Every write touches a
+    generation file under root; each process brings its index up to date
+    with documents written by other processes when that file has changed,
+    before searching and before saving the index.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        root: str,
+        ann: Optional["HnswIndex"] = None,
+        ann_save_interval: float = 60,
+        max_open_documents: int = 256,
+    ):
+        self.root = root
+        self.ann = ann
+        self.ann_save_interval = ann_save_interval
+        self.max_open_documents = max_open_documents
+        self._lock = threading.Lock()
+        # Upserts read, merge and rewrite a document; one writer at a time. Reentrant,
+        # as saving the ANN index syncs it first
+        self._write_lock = threading.RLock()
+        # directory -> (version, segments, parts), least recently used first
+        self._open: "OrderedDict[str, tuple]" = OrderedDict()
+        self._ann_generation: Optional[int] = None
+        os.makedirs(root, exist_ok=True)
+
+    def warmup(self):
+        import numpy  # noqa: F401
+
+        if self.ann is not None:
+            self._sync_ann()
+
+    def _manifest_version(self, directory: str) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(directory, "chunks.json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _generation(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.root, ".generation")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _bump_generation(self):
+        path = os.path.join(self.root, ".generation")
+        with open(path, "a"):
+            pass
+        os.utime(path)
+
+    def _sync_ann_if_changed(self):
+        if self._generation() != self._ann_generation:
+            self._sync_ann(save=False)
+
+    def _sync_ann(self, save: bool = True):
+        """Adds documents written after the index was last saved, by any process, and drops deleted ones."""
+        with self._write_lock:
+            # Read before scanning, so a write during the scan triggers another sync
+            generation = self._generation()
+            on_disk = set()
+            for entry in os.scandir(self.root):
+                parts = self._load(entry.path) if entry.is_dir() else None
+                if not parts:
+                    continue
+                source_file = parts[0][1][0]["source_file"]
+                version = self._manifest_version(entry.path)
+                on_disk.add(source_file)
+                if self.ann.versions.get(source_file) != version:
+                    self.ann.remove_document(source_file)
+                    for matrix, chunks in parts:
+                        self.ann.add(
+                            [(source_file, chunk["chunk_number"]) for chunk in chunks],
+                            matrix,
+                            {source_file: version},
+                        )
+
+            for source_file in set(self.ann.versions) - on_disk:
+                self.ann.remove_document(source_file)
+
+            self._ann_generation = generation
+            if save and self.ann.dirty:
+                self.ann.save()
+            logging.info(f"ANN index holds {len(self.ann)} vectors")
+
+    def _save_ann(self):
+        # Saved files replace what other processes saved, so include their documents first
+        self._sync_ann_if_changed()
+        self.ann.save()
+
+    def _save_ann_if_due(self):
+        if self.ann is not None and self.ann.dirty and time.monotonic() - self.ann.saved_at >= self.ann_save_interval:
+            self._save_ann()
+
+    def close(self):
+        if self.ann is not None and self.ann.dirty:
+            with self._write_lock:
+                self._save_ann()
+
+    def _document_dir(self, source_file: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(source_file.encode("utf-8")).hexdigest())
+
+    def _load(self, directory: str):
+        """Returns the (matrix, chunks) of each of a document's segments, or None if it has none."""
+        manifest_path = os.path.join(directory, "chunks.json")
+        for _ in range(3):
+            try:
+                version = os.stat(manifest_path).st_mtime_ns
+            except FileNotFoundError:
+                return None
+
+            with self._lock:
+                cached = self._open.get(directory)
+                if cached and cached[0] == version:
+                    self._open.move_to_end(directory)
+                    return cached[2]
+
+            # Segments never change, so those read by an earlier load are reused
+            previous = {segment["vectors"]: part for segment, part in zip(cached[1], cached[2])} if cached else {}
+            try:
+                segments = self._read_manifest(directory)
+                parts = [previous.get(segment["vectors"]) or self._read_segment(directory, segment) for segment in segments]
+            except FileNotFoundError:
+                # Replaced by a writer between the reads; read the new version
+                continue
+
+            with self._lock:
+                self._open[directory] = (version, segments, parts)
+                self._open.move_to_end(directory)
+                while len(self._open) > self.max_open_documents:
+                    self._open.popitem(last=False)
+            return parts
+
+        return None
+
+    def _read_manifest(self, directory: str) -> List[Dict[str, Any]]:
+        with open(os.path.join(directory, "chunks.json"), encoding="utf-8") as f:
+            return json.load(f)["segments"]
+
+    def _read_segment(self, directory: str, segment: Dict[str, Any]):
+        import numpy as np
+
+        with self._lock:
+            cached = self._open.get(directory)
+        if cached:
+            for cached_segment, part in zip(cached[1], cached[2]):
+                if cached_segment["vectors"] == segment["vectors"]:
+                    return part
+
+        with open(os.path.join(directory, segment["chunks"]), encoding="utf-8") as f:
+            chunks = json.load(f)
+        return np.load(os.path.join(directory, segment["vectors"]), mmap_mode="r"), chunks
+
+    def _write_segment(self, directory: str, matrix, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        import numpy as np
+
+        os.makedirs(directory, exist_ok=True)
+        # Segment files are never modified, only replaced by new ones named in
+        # chunks.json; an old file stays readable through open maps after removal
+        name = uuid.uuid4().hex
+        numbers = [chunk["chunk_number"] for chunk in chunks]
+        segment = {
+            "vectors": f"vectors-{name}.npy",
+            "chunks": f"rows-{name}.json",
+            "rows": len(chunks),
+            "first": min(numbers),
+            "last": max(numbers),
+        }
+        with open(os.path.join(directory, segment["vectors"]), "wb") as f:
+            np.save(f, matrix)
+        with open(os.path.join(directory, segment["chunks"]), "w", encoding="utf-8") as f:
+            json.dump(chunks, f)
+        return segment
+
+    def _commit(self, directory: str, segments: List[Dict[str, Any]]):
+        # Swapping chunks.json in is the commit, so readers never see half a write
+        with open(os.path.join(directory, "chunks.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump({"segments": segments}, f)
+        os.replace(os.path.join(directory, "chunks.json.tmp"), os.path.join(directory, "chunks.json"))
+        self._remove_segments(directory, keep={segment[key] for segment in segments for key in ("vectors", "chunks")})
+        self._bump_generation()
+
+    def _remove_segments(self, directory: str, keep: frozenset = frozenset()):
+        for entry in os.scandir(directory):
+            if entry.name.startswith(("vectors-", "rows-")) and entry.name not in keep:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def _upsert_document(self, source_file: str, rows: List[Dict[str, Any]]):
+        directory = self._document_dir(source_file)
+        with self._write_lock:
+            matrix, chunks = self._append_and_write(directory, rows)
+
+            if self.ann is not None:
+                self.ann.add(
+                    [(source_file, chunk["chunk_number"]) for chunk in chunks],
+                    matrix,
+                    {source_file: self._manifest_version(directory)},
+                )
+                self._save_ann_if_due()
+
+    def _append_and_write(self, directory: str, rows: List[Dict[str, Any]]):
+        """
+        Writes rows as a new segment, merged with the newest segments while
+        they hold no more rows than it; only those are read. Rows replacing
+        chunks already stored rewrite the document instead. Returns the
+        normalized rows written.
+        """
+        import numpy as np
+
+        by_number = {row["chunk_number"]: row for row in rows}
+        ordered = [by_number[number] for number in sorted(by_number)]
+        chunks = [{field: row[field] for field in CHUNK_FIELDS} for row in ordered]
+        matrix = np.array([row["embedding"] for row in ordered], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        try:
+            segments = self._read_manifest(directory)
+        except FileNotFoundError:
+            segments = []
+
+        # Segments record their chunk number range, so only those it overlaps are checked
+        first, last = chunks[0]["chunk_number"], chunks[-1]["chunk_number"]
+        if any(
+            chunk["chunk_number"] in by_number
+            for segment in segments if segment["first"] <= last and segment["last"] >= first
+            for chunk in self._read_segment(directory, segment)[1]
+        ):
+            kept_matrices, kept_chunks = [], []
+            for segment in segments:
+                part_matrix, part_chunks = self._read_segment(directory, segment)
+                keep = [i for i, chunk in enumerate(part_chunks) if chunk["chunk_number"] not in by_number]
+                kept_matrices.append(part_matrix[keep])
+                kept_chunks.extend(part_chunks[i] for i in keep)
+            merged_matrix = np.concatenate(kept_matrices + [matrix])
+            self._commit(directory, [self._write_segment(directory, merged_matrix, kept_chunks + chunks)])
+            return matrix, chunks
+
+        tail_matrix, tail_chunks = matrix, chunks
+        while segments and segments[-1]["rows"] <= len(tail_chunks):
+            segment = segments.pop()
+            part_matrix, part_chunks = self._read_segment(directory, segment)
+            tail_matrix = np.concatenate([part_matrix, tail_matrix])
+            tail_chunks = part_chunks + tail_chunks
+        segments.append(self._write_segment(directory, tail_matrix, tail_chunks))
+        self._commit(directory, segments)
+        return matrix, chunks
+
+    async def upsert(self, rows: List[Dict[str, Any]]) -> Dict[str, float]:
+        by_document: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_document.setdefault(row["source_file"], []).append(row)
+
+        for source_file, document_rows in by_document.items():
+            await run_blocking(self._upsert_document, source_file, document_rows)
+
+        return {"rows": len(rows), "batches": len(by_document), "requests": len(by_document), "splits": 0}
+
+    def _delete_document(self, source_file: str):
+        directory = self._document_dir(source_file)
+        with self._write_lock:
+            with self._lock:
+                self._open.pop(directory, None)
+            try:
+                os.remove(os.path.join(directory, "chunks.json"))
+            except FileNotFoundError:
+                return
+            self._remove_segments(directory)
+            self._bump_generation()
+            if self.ann is not None:
+                self.ann.remove_document(source_file)
+                self._save_ann_if_due()
+
+    async def delete_document(self, source_file: str):
+        await run_blocking(self._delete_document, source_file)
+
+    def _search(self, embedding: Sequence[float], source_file: str, k: int) -> List[Dict[str, Any]]:
+        import numpy as np
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query /= norm
+
+        if not source_file and self.ann is not None:
+            self._sync_ann_if_changed()
+            return self._search_ann(query, k)
+
+        if source_file:
+            directories = [self._document_dir(source_file)]
+        else:
+            directories = [entry.path for entry in os.scandir(self.root) if entry.is_dir()]
+
+        candidates = []
+        for directory in directories:
+            for matrix, chunks in self._load(directory) or []:
+                scores = matrix @ query
+                top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+                candidates.extend((float(scores[i]), chunks[i]) for i in top)
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return [{**chunk, "similarity": score} for score, chunk in candidates[:k]]
+
+    def _load_document(self, source_file: str):
+        import numpy as np
+
+        parts = self._load(self._document_dir(source_file))
+        if not parts:
+            return None
+        # Copied out of the maps into one matrix, so the cached matrix lives in RAM
+        matrix = np.concatenate([np.asarray(part_matrix, dtype=np.float32) for part_matrix, _ in parts])
+        return [chunk for _, chunks in parts for chunk in chunks], matrix
+
+    async def load_document(self, source_file: str):
+        return await run_blocking(self._load_document, source_file)
+
+    def _search_ann(self, query, k: int) -> List[Dict[str, Any]]:
+        results = []
+        by_number: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        for (source_file, chunk_number), score in self.ann.search(query, k):
+            directory = self._document_dir(source_file)
+            if directory not in by_number:
+                parts = self._load(directory) or []
+                by_number[directory] = {chunk["chunk_number"]: chunk for _, chunks in parts for chunk in chunks}
+            chunk = by_number[directory].get(chunk_number)
+            if chunk is not None:
+                results.append({**chunk, "similarity": score})
+        return results
+
+    async def search(self, embedding: Sequence[float], source_file: str = "", k: int = 3) -> List[Dict[str, Any]]:
+        return await run_blocking(self._search, embedding, source_file, k)
+
+@lru_cache()
+def get_vector_store() -> VectorStore:
+    if settings.vector_store_backend == "local":
+        ann = None
+        if settings.ann_enabled:
+            from app.services.ann_index import AnnUnavailable, HnswIndex
+            try:
+                ann = HnswIndex(
+                    settings.ann_index_path,
+                    settings.embedding_dimensions,
+                    m=settings.ann_m,
+                    ef_construction=settings.ann_ef_construction,
+                    ef_search=settings.ann_ef_search,
+                    initial_capacity=settings.ann_initial_capacity,
+                )
+            except AnnUnavailable as e:
+                logging.error(f"ANN index disabled, searching exactly: {e}")
+        return LocalVectorStore(settings.local_vector_store_path, ann=ann, ann_save_interval=settings.ann_save_interval_seconds)
+    if settings.vector_store_backend != "supabase":
+        logging.error(f"Unknown VECTOR_STORE_BACKEND {settings.vector_store_backend!r}, using supabase")
+
+    return SupabaseVectorStore(
+        batch_rows=settings.insert_batch_rows,
+        max_in_flight=settings.insert_max_in_flight,
+        max_retries=settings.insert_max_retries,
+    )
@@ -1,28 +1,45 @@
 import json
+import time
 import asyncio
 import logging
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, TYPE_CHECKING
+from functools import lru_cache
 from dotenv import load_dotenv
 from dataclasses import dataclass
 
-from openai import AsyncOpenAI
-from supabase import create_client, Client
-
 from app.services.chunker import token_chunking
+from app.services.embeddings import EmbeddingError, get_batch_embedder
+from app.services.vector_store import get_vector_store
+from app.services.hot_documents import get_hot_documents
+from app.utils.timeline import stage
+from app.services.scheduler import BULK, INTERACTIVE, estimate_tokens, get_scheduler
+from app.services.embedding_cache import cache_key, get_embedding_cache
 from app.core import get_settings
 settings = get_settings()
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+    from supabase import Client
+
 load_dotenv()
 
-openai_client = AsyncOpenAI(
-    api_key = settings.gemini_api_key,
-    base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
-)
+@lru_cache()
+def get_openai_client() -> "AsyncOpenAI":
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key = settings.gemini_api_key,
+        base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
+    )
+
+@lru_cache()
+def get_supabase() -> "Client":
+    from supabase import create_client
 
-supabase: Client = create_client(
-    settings.supabase_url,
-    settings.supabase_service_key
-)
+    return create_client(
+        settings.supabase_url,
+        settings.supabase_service_key
+    )
 
 @dataclass
 class ProcessedChunk:
@@ -43,7 +60,7 @@ async def get_title_and_summary(chunk: str) -> Dict[str, str]:
     Keep both title and summary concise but informative."""
 
     try:
-        response = await openai_client.chat.completions.create(
+        response = await get_openai_client().chat.completions.create(
             model="gemini-2.0-flash",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -65,21 +82,36 @@ async def get_title_and_summary(chunk: str) -> Dict[str, str]:
         logging.error(f"Error getting title and summary: {e}")
         return {"title": "Error processing title", "summary": "Error processing summary"}
 
-async def get_embedding(text: str) -> List[float]:
-    try:
-        response = await openai_client.embeddings.create(
-            model="gemini-embedding-001",
-            dimensions=1536,
+async def get_embedding(text: str, priority: str = INTERACTIVE) -> List[float]:
+    cache = get_embedding_cache()
+    key = cache_key(settings.embedding_model, settings.embedding_dimensions, text)
+    if cache is not None:
+        cached = (await cache.aget_many([key]))[0]
+        if cached is not None:
+            return cached
+
+    # Failures raise: a zero vector stored or searched with would silently poison results
+    response = await get_scheduler().call(
+        settings.embedding_model,
+        lambda: get_openai_client().embeddings.create(
+            model=settings.embedding_model,
+            dimensions=settings.embedding_dimensions,
             input=text
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        logging.error(f"Error getting embedding: {e}")
-        return [0] * 1536
+        ),
+        tokens=estimate_tokens(text),
+        priority=priority,
+    )
+    embedding = response.data[0].embedding if response.data else None
+    if not embedding:
+        raise EmbeddingError("Embedding response contained no vector")
+
+    if cache is not None:
+        await cache.aput_many([(key, embedding)])
+    return embedding
 
 async def process_chunk(chunk: str, chunk_number: int, source_file: str) -> ProcessedChunk:
     extracted = await get_title_and_summary(chunk)
-    embedding = await get_embedding(chunk)
+    embedding = await get_embedding(chunk, priority=BULK)
 
     return ProcessedChunk(
         chunk_number=chunk_number,
@@ -90,18 +122,21 @@ async def process_chunk(chunk: str, chunk_number: int, source_file: str) -> Proc
         source_file=source_file
     )
 
+def _chunk_row(chunk: ProcessedChunk) -> Dict:
+    return {
+        "chunk_number": chunk.chunk_number,
+        "title": chunk.title,
+        "summary": chunk.summary,
+        "content": chunk.content,
+        "embedding": chunk.embedding,
+        "source_file": chunk.source_file
+    }
+
 async def insert_chunk(chunk: ProcessedChunk):
     try:
-        data = {
-            "chunk_number": chunk.chunk_number,
-            "title": chunk.title,
-            "summary": chunk.summary,
-            "content": chunk.content,
-            "embedding": chunk.embedding,
-            "source_file": chunk.source_file
-        }
+        data = _chunk_row(chunk)
         
-        result = supabase.table("pdf_chunks").insert(data).execute()
+        result = await get_vector_store().upsert([data])
         logging.info(f"Inserted chunk {chunk.chunk_number} from {chunk.source_file}")
         
         return result
@@ -109,15 +144,83 @@ async def insert_chunk(chunk: ProcessedChunk):
         logging.error(f"Error inserting chunk: {e}")
         return None
 
-async def process_and_store_document(text: str, source_file: str):
-    chunks = token_chunking(text)
+async def insert_chunks(chunks: List[ProcessedChunk]) -> Dict[str, float]:
+    """
+    Stores chunks in the configured vector store; see VectorStore.upsert.
+
+    Returns:
+        rows, batches, requests, splits, seconds and rows_per_second
+    """
+    started = time.monotonic()
+    stats = await get_vector_store().upsert([_chunk_row(chunk) for chunk in chunks])
+
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    stats["rows_per_second"] = round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    logging.info(
+        f"Inserted {stats['rows']} chunks in {stats['batches']} batches ({stats['requests']} requests) "
+        f"in {stats['seconds']}s: {stats['rows_per_second']} rows/s"
+    )
+    return stats
+
+async def process_chunks(chunks: List[str], source_file: str, first_chunk_number: int = 0) -> List[ProcessedChunk]:
+    # Embeddings are packed into a few batched requests instead of one per chunk
+    embeddings = await get_batch_embedder().embed_many(chunks)
+    extracted = await asyncio.gather(*[get_title_and_summary(chunk) for chunk in chunks])
+
+    return [
+        ProcessedChunk(
+            chunk_number=first_chunk_number + i,
+            title=details["title"],
+            summary=details["summary"],
+            content=chunk,
+            embedding=embedding,
+            source_file=source_file
+        )
+        for i, (chunk, details, embedding) in enumerate(zip(chunks, extracted, embeddings))
+    ]
+
+def cache_processed_document(source_file: str, processed: List[ProcessedChunk]) -> bool:
+    """Puts freshly embedded chunks in the hot document cache; returns whether they are searchable there."""
+    hot_documents = get_hot_documents()
+    if hot_documents is None or not processed:
+        return False
+
+    import numpy as np
+
+    matrix = np.array([chunk.embedding for chunk in processed], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+    rows = [{key: value for key, value in _chunk_row(chunk).items() if key != "embedding"} for chunk in processed]
+
+    hot_documents.put(source_file, rows, matrix)
+    return source_file in hot_documents
+
+async def process_and_store_document(text: str, source_file: str, on_searchable: Optional[Callable[[], None]] = None):
+    """
+    Chunks, embeds and stores text under source_file.
+
+    on_searchable is called as soon as the chunks can be searched in memory,
+    before they are written to the vector store, so a caller can start
+    answering while the write is still in progress.
+    """
+    with stage("chunk"):
+        chunks = token_chunking(text)
 
     # for i, chunk in enumerate(chunks):
     #     pc = await process_chunk(chunk, i, source_file)
     #     await insert_chunk(pc)
     
-    processed = await asyncio.gather(*[
-        process_chunk(chunk, i, source_file) for i, chunk in enumerate(chunks)
-    ])
-    
-    await asyncio.gather(*[insert_chunk(c) for c in processed])
+    with stage("embed_chunks"):
+        processed = await process_chunks(chunks, source_file)
+    if cache_processed_document(source_file, processed) and on_searchable is not None:
+        on_searchable()
+
+    try:
+        with stage("store_chunks"):
+            await insert_chunks(processed)
+    except Exception:
+        # Don't keep answering from chunks that were never stored
+        hot_documents = get_hot_documents()
+        if hot_documents is not None:
+            hot_documents.invalidate(source_file)
+        raise
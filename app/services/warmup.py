@@ -0,0 +1,55 @@
+import time
+import logging
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.utils.executors import run_blocking
+
+warmup_state: Dict[str, Any] = {
+    "ready": False,
+    "duration": None,
+    "steps": {},
+}
+
+def _warmup_steps() -> List[Tuple[str, Callable[[], Any]]]:
+    from app.services.chunker import get_encoding
+    from app.services.vector_store_service import get_openai_client
+    from app.services.vector_store import get_vector_store
+    from app.services.rag import get_genai_client
+    from app.services.agent import get_agent
+
+    return [
+        ("tokenizer", get_encoding),
+        ("openai_client", get_openai_client),
+        ("vector_store", lambda: get_vector_store().warmup()),
+        ("genai_client", get_genai_client),
+        ("agent", get_agent),
+    ]
+
+def _run_steps() -> Dict[str, Any]:
+    steps = {}
+    for name, step in _warmup_steps():
+        started = time.monotonic()
+        try:
+            step()
+            steps[name] = {"ok": True, "seconds": round(time.monotonic() - started, 3)}
+        except Exception as e:
+            logging.error(f"Warmup step {name} failed: {e}")
+            steps[name] = {"ok": False, "seconds": round(time.monotonic() - started, 3), "error": str(e)}
+    return steps
+
+async def warmup():
+    """
+    Loads the tokenizer, model clients and agent ahead of the first request.
+
+    The service reports ready only once every step has succeeded. Steps run
+    one after another on a worker thread, since they are mostly imports and
+    would otherwise block the loop.
+    """
+    started = time.monotonic()
+    steps = await run_blocking(_run_steps)
+
+    warmup_state["steps"] = steps
+    warmup_state["duration"] = round(time.monotonic() - started, 3)
+    warmup_state["ready"] = all(step["ok"] for step in steps.values())
+
+    logging.info(f"Warmup finished in {warmup_state['duration']}s: {steps}")
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Optional
+
+class WriteBehind:
+    """
+    Tracks background persistence so responses don't wait on database writes.
+
+    Tasks are keyed (e.g. by file hash) so callers can find a pending write and
+    chain onto it. Failures are logged and counted. drain() waits for whatever
+    is still running, e.g. on shutdown.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+
+    def submit(self, key: str, work: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.ensure_future(work)
+        self._tasks[key] = task
+        self.started += 1
+        task.add_done_callback(lambda t: self._finish(key, t))
+        return task
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+        if task.cancelled():
+            self.failed += 1
+            self.last_error = "cancelled"
+        elif task.exception() is not None:
+            self.failed += 1
+            self.last_error = str(task.exception())
+            logging.error(f"[{self.name}] Background write {key} failed: {task.exception()}")
+        else:
+            self.completed += 1
+
+    def pending(self, key: str) -> Optional[asyncio.Task]:
+        return self._tasks.get(key)
+
+    async def drain(self, timeout: Optional[float] = None):
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        logging.info(f"[{self.name}] Waiting for {len(tasks)} background writes")
+        _, still_running = await asyncio.wait(tasks, timeout=timeout)
+        if still_running:
+            logging.error(f"[{self.name}] {len(still_running)} background writes did not finish before shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._tasks),
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "last_error": self.last_error,
+        }
+
+ingestion_writes = WriteBehind("ingestion")
@@ -0,0 +1,90 @@
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"\s+")
+
+def normalize_line(line: str) -> str:
+    """Compares lines regardless of case, spacing and numbers, so "Page 3 of 40" matches "Page 4 of 40"."""
+    return _SPACES.sub(" ", _DIGITS.sub("#", line)).strip().lower()
+
+@dataclass(frozen=True)
+class Boilerplate:
+    """Lines a PDF repeats in its page headers and footers, learned from its first pages."""
+    lines: FrozenSet[str]  # normalized
+    band: float  # share of the page height at the top and bottom the lines appear in
+
+    def __bool__(self) -> bool:
+        return bool(self.lines)
+
+def _in_band(block: tuple, height: float, band: float) -> bool:
+    _, y0, _, y1 = block[:4]
+    return y1 <= height * band or y0 >= height * (1 - band)
+
+def _text_blocks(page) -> List[tuple]:
+    return [block for block in page.get_text("blocks") if block[6] == 0]
+
+def learn_boilerplate(doc, pages: int, band: float, min_share: float) -> Boilerplate:
+    """
+    Finds the lines in the top and bottom bands of the first pages that
+    recur on at least min_share of them. Documents too short to tell a
+    header from content yield no boilerplate.
+    """
+    sample = min(pages, doc.page_count)
+    if sample < 3:
+        return Boilerplate(frozenset(), band)
+
+    seen = Counter()
+    for number in range(sample):
+        page = doc[number]
+        height = page.rect.height
+        lines = {
+            normalize_line(line)
+            for block in _text_blocks(page) if _in_band(block, height, band)
+            for line in block[4].splitlines()
+        }
+        seen.update(line for line in lines if line)
+
+    threshold = max(2, sample * min_share)
+    return Boilerplate(frozenset(line for line, count in seen.items() if count >= threshold), band)
+
+def strip_page(page, boilerplate: Boilerplate) -> Tuple[str, List[str]]:
+    """Returns a page's text without its boilerplate lines, and the lines removed."""
+    height = page.rect.height
+    kept = []
+    removed = []
+    for block in _text_blocks(page):
+        lines = block[4].splitlines()
+        if _in_band(block, height, boilerplate.band):
+            removed.extend(line for line in lines if normalize_line(line) in boilerplate.lines)
+            lines = [line for line in lines if normalize_line(line) not in boilerplate.lines]
+        if lines:
+            kept.append("\n".join(lines) + "\n")
+    return "".join(kept).replace("\x00", ""), removed
+
+@dataclass
+class BoilerplateReport:
+    """What was stripped from one document: a copy of each boilerplate line, and the bytes and tokens saved."""
+    examples: Dict[str, str] = field(default_factory=dict)  # normalized -> first line as it appeared
+    removed_lines: Counter = field(default_factory=Counter)
+
+    def add(self, removed: List[str]):
+        for line in removed:
+            self.examples.setdefault(normalize_line(line), line.strip())
+        self.removed_lines.update(removed)
+
+    def as_dict(self) -> Dict[str, Any]:
+        from app.services.chunker import get_encoding
+
+        encoding = get_encoding()
+        # Each removed line also took its newline with it
+        bytes_saved = sum((len(line.encode()) + 1) * count for line, count in self.removed_lines.items())
+        tokens_saved = sum(len(encoding.encode_ordinary(line + "\n")) * count for line, count in self.removed_lines.items())
+        return {
+            "lines": list(self.examples.values()),
+            "removed_lines": sum(self.removed_lines.values()),
+            "bytes_saved": bytes_saved,
+            "tokens_saved": tokens_saved,
+        }
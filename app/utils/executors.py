@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.core import get_settings
+
+T = TypeVar("T")
+
+settings = get_settings()
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def _pool_size(pool: str) -> int:
+    if pool == "extract":
+        return settings.extract_executor_workers
+    return settings.io_executor_workers
+
+def get_executor(pool: str = "io") -> ThreadPoolExecutor:
+    """
+    Returns the bounded thread pool for a kind of blocking work.
+
+    "io" is for blocking network and disk calls (sync SDK clients, file reads),
+    "extract" is for CPU-heavy document parsing, kept small so it can't starve
+    the io pool.
+    """
+    executor = _executors.get(pool)
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=_pool_size(pool), thread_name_prefix=f"{pool}-worker")
+        _executors[pool] = executor
+    return executor
+
+async def run_blocking(fn: Callable[..., T], *args: Any, pool: str = "io", **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(pool), functools.partial(fn, *args, **kwargs))
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Returns the shared process pool for CPU-bound work that holds the GIL.
+
+    Workers are spawned rather than forked, since forking a process that is
+    already running executor threads can deadlock.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.process_pool_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+def shutdown_executors():
+    global _process_pool
+    for name, executor in list(_executors.items()):
+        logging.info(f"Shutting down {name} executor")
+        executor.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
+
+    if _process_pool is not None:
+        logging.info("Shutting down process pool")
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
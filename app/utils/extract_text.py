@@ -1,64 +1,207 @@
-import fitz  # PyMuPDF
-import docx
+# Format libraries (PyMuPDF, python-docx, pandas, python-pptx) are imported
+# inside the extractors so each is only loaded once that format is seen.
 import email
+import email.message
+import io
 import os
-from typing import Optional
-import pandas as pd
-from pptx import Presentation
-from app.services.rag import read_image
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from app.utils.boilerplate import Boilerplate, BoilerplateReport, learn_boilerplate, strip_page
+from app.utils.executors import get_process_pool
+from app.core import get_settings
+
+settings = get_settings()
+
+# Extractors take either a file path or the document's bytes
+DocumentSource = Union[str, bytes]
+
+
+@dataclass
+class PdfText:
+    text: str
+    page_offsets: List[int]  # Character offset in text where each page starts
+    boilerplate: Optional[Dict[str, Any]] = None  # BoilerplateReport of what was stripped
 
 
 def sanitize_text(text: str) -> str:
     # Remove null characters and strip
     return text.replace("\x00", "").strip()
 
-def extract_from_pdf(file_path: str) -> str:
+def as_file(source: DocumentSource):
+    """Returns something the format libraries can open: the path, or a file-like over the bytes."""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+def spill_source(source: DocumentSource) -> str:
+    """
+    Returns a path to hand process pool workers instead of the bytes, which
+    would otherwise be pickled to a worker for every page range. Bytes are
+    written once to a temp file, which the caller removes.
+    """
+    if not isinstance(source, (bytes, bytearray)):
+        return source
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(source)
+    return path
+
+@contextmanager
+def pool_source(source: DocumentSource) -> Iterator[str]:
+    path = spill_source(source)
     try:
-        text = ""
-        with fitz.open(file_path) as doc:
-            for page in doc:
-                text += page.get_text()
-        return sanitize_text(text)
+        yield path
+    finally:
+        if path is not source:
+            os.remove(path)
+
+def open_pdf(source: DocumentSource):
+    import fitz  # PyMuPDF
+
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+def extract_pdf_page_range(source: DocumentSource, start: int, end: int) -> List[str]:
+    # Runs in pool workers, so it opens the document itself
+    with open_pdf(source) as doc:
+        return [doc[i].get_text().replace("\x00", "") for i in range(start, end)]
+
+def learn_pdf_boilerplate(source: DocumentSource) -> Tuple[int, Boilerplate]:
+    """
+    Opens a PDF once for its page count and its repeated header and footer
+    lines, learned from the first pages (none if stripping is off).
+    """
+    with open_pdf(source) as doc:
+        if not settings.boilerplate_stripping:
+            return doc.page_count, Boilerplate(frozenset(), settings.boilerplate_band)
+        return doc.page_count, learn_boilerplate(
+            doc,
+            settings.boilerplate_learn_pages,
+            settings.boilerplate_band,
+            settings.boilerplate_min_share,
+        )
+
+def extract_pdf_page_range_stripped(
+    source: DocumentSource, start: int, end: int, boilerplate: Boilerplate
+) -> Tuple[List[str], List[str]]:
+    """Like extract_pdf_page_range, without boilerplate lines; also returns the lines removed."""
+    if not boilerplate:
+        return extract_pdf_page_range(source, start, end), []
+
+    pages = []
+    removed = []
+    with open_pdf(source) as doc:
+        for i in range(start, end):
+            text, stripped = strip_page(doc[i], boilerplate)
+            pages.append(text)
+            removed.extend(stripped)
+    return pages, removed
+
+def join_pages(pages: List[str]) -> PdfText:
+    offsets = []
+    position = 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page)
+
+    text = "".join(pages)
+    stripped = text.lstrip()
+    leading = len(text) - len(stripped)
+
+    return PdfText(
+        text=stripped.rstrip(),
+        page_offsets=[max(0, offset - leading) for offset in offsets]
+    )
+
+def _page_shards(page_count: int, workers: int) -> List[tuple]:
+    # A couple of shards per worker evens out pages of very different density
+    shard_size = max(settings.pdf_min_pages_per_shard, -(-page_count // (workers * 2)))
+    return [(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)]
+
+def extract_pdf_pages(source: DocumentSource) -> PdfText:
+    """
+    Extracts a PDF's text along with the offset where each page starts.
+
+    Large documents are split into page ranges extracted in parallel on the
+    process pool; small ones are extracted in-process to skip the pool overhead.
+    Header and footer lines repeated across pages are stripped first.
+    """
+    try:
+        page_count, boilerplate = learn_pdf_boilerplate(source)
+
+        if page_count < settings.pdf_parallel_min_pages:
+            results = [extract_pdf_page_range_stripped(source, 0, page_count, boilerplate)]
+        else:
+            pool = get_process_pool()
+            with pool_source(source) as path:
+                futures = [
+                    pool.submit(extract_pdf_page_range_stripped, path, start, end, boilerplate)
+                    for start, end in _page_shards(page_count, settings.process_pool_workers)
+                ]
+                results = [future.result() for future in futures]
+
+        pdf = join_pages([page for pages, _ in results for page in pages])
+        if boilerplate:
+            report = BoilerplateReport()
+            for _, removed in results:
+                report.add(removed)
+            pdf.boilerplate = report.as_dict()
+        return pdf
     except Exception as e:
         raise RuntimeError(f"PDF extraction failed: {e}")
 
-def extract_from_docx(file_path: str) -> str:
+def extract_from_pdf(source: DocumentSource) -> str:
+    return extract_pdf_pages(source).text
+
+def extract_from_docx(source: DocumentSource) -> str:
     try:
-        doc = docx.Document(file_path)
+        import docx
+
+        doc = docx.Document(as_file(source))
         text = "\n".join([para.text for para in doc.paragraphs])
         return sanitize_text(text)
     except Exception as e:
         raise RuntimeError(f"DOCX extraction failed: {e}")
 
-def extract_from_email(file_path: str) -> str:
+def read_email(source: DocumentSource) -> email.message.Message:
+    if isinstance(source, (bytes, bytearray)):
+        return email.message_from_bytes(source)
+    with open(source, "r", encoding="utf-8", errors="ignore") as f:
+        return email.message_from_file(f)
+
+def extract_from_email(source: DocumentSource) -> str:
     try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            msg = email.message_from_file(f)
-            body = ""
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            body += payload.decode(errors="ignore")
-            else:
-                payload = msg.get_payload(decode=True)
-                if payload:
-                    body += payload.decode(errors="ignore")
-            return sanitize_text(body)
+        msg = read_email(source)
+        body = ""
+        if msg.is_multipart():
+            for part in msg.walk():
+                if part.get_content_type() == "text/plain":
+                    payload = part.get_payload(decode=True)
+                    if payload:
+                        body += payload.decode(errors="ignore")
+        else:
+            payload = msg.get_payload(decode=True)
+            if payload:
+                body += payload.decode(errors="ignore")
+        return sanitize_text(body)
     except Exception as e:
         raise RuntimeError(f"Email extraction failed: {e}")
 
-def extract_from_csv(file_path: str) -> str:
+def extract_from_csv(source: DocumentSource) -> str:
     try:
-        df = pd.read_csv(file_path, encoding="utf-8", errors="ignore")
+        import pandas as pd
+
+        df = pd.read_csv(as_file(source), encoding="utf-8", encoding_errors="ignore")
         return sanitize_text(df.to_markdown(index=False))
     except Exception as e:
         raise RuntimeError(f"CSV extraction failed: {e}")
 
-def extract_from_xlsx(file_path: str) -> str:
+def extract_from_xlsx(source: DocumentSource) -> str:
     try:
-        df_list = pd.read_excel(file_path, sheet_name=None) 
+        import pandas as pd
+
+        df_list = pd.read_excel(as_file(source), sheet_name=None) 
         text = ""
         for sheet_name, df in df_list.items():
             text += f"Sheet: {sheet_name}\n"
@@ -78,8 +221,11 @@ EXT_TO_MIME = {
     "svg": "image/svg+xml",
 }
 
-def extract_from_pptx(file_path: str) -> str:
-    prs = Presentation(file_path)
+def extract_from_pptx(source: DocumentSource) -> str:
+    from pptx import Presentation
+    from app.services.rag import describe_image
+
+    prs = Presentation(as_file(source))
     extracted_content = []
 
     for slide_num, slide in enumerate(prs.slides, 1):
@@ -102,7 +248,7 @@ def extract_from_pptx(file_path: str) -> str:
                 image_bytes = image.blob
                 ext = image.ext.lower()
                 mime_type = EXT_TO_MIME.get(ext, "application/octet-stream")
-                image_content = read_image(image_bytes=image_bytes, mime_type=mime_type)
+                image_content = describe_image(image_bytes, mime_type=mime_type)
                 
                 slide_content['images'].append(image_content)
         
@@ -121,41 +267,51 @@ def extract_from_pptx(file_path: str) -> str:
 
     return "\n\n".join(output_lines)
 
-def extract_fallback(file_path: str) -> str:
+def extract_fallback(source: DocumentSource) -> str:
+    if isinstance(source, (bytes, bytearray)):
+        return sanitize_text(bytes(source).decode("utf-8", errors="ignore"))
     try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        with open(source, "r", encoding="utf-8", errors="ignore") as f:
             return sanitize_text(f.read())
     except Exception:
         try:
-            with open(file_path, "rb") as f:
+            with open(source, "rb") as f:
                 content = f.read()
                 return sanitize_text(content.decode("utf-8", errors="ignore"))
         except Exception as e:
             raise RuntimeError(f"Fallback extraction failed: {e}")
 
-def extract_text(file_path: str, mime_type: Optional[str] = None) -> str:
-    ext = os.path.splitext(file_path)[1].lower()
+def extract_text(source: DocumentSource, mime_type: Optional[str] = None, filename: Optional[str] = None) -> str:
+    """
+    Extracts text from a document given as a file path or as bytes.
+
+    The format is picked from the extension of filename (or of the path) and
+    mime_type; pass filename when source is bytes.
+    """
+    if filename is None and isinstance(source, str):
+        filename = source
+    ext = os.path.splitext(filename or "")[1].lower()
 
     try:
         if ext == ".pdf" or mime_type == "application/pdf":
-            return extract_from_pdf(file_path)
+            return extract_from_pdf(source)
         elif ext == ".docx" or mime_type in [
             "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
         ]:
-            return extract_from_docx(file_path)
+            return extract_from_docx(source)
         elif ext in [".eml", ".msg"] or mime_type == "message/rfc822":
-            return extract_from_email(file_path)
+            return extract_from_email(source)
         elif ext == ".csv" or mime_type == "text/csv":
-            return extract_from_csv(file_path)
+            return extract_from_csv(source)
         elif ext == ".xlsx" or mime_type in [
             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         ]:
-            return extract_from_xlsx(file_path)
+            return extract_from_xlsx(source)
         elif ext == ".pptx" or mime_type in [
             "application/vnd.openxmlformats-officedocument.presentationml.presentation"
         ]:
-            return extract_from_pptx(file_path)
+            return extract_from_pptx(source)
         else:
-            return extract_fallback(file_path)
+            return extract_fallback(source)
     except Exception as e:
         return f"Error extracting text: {str(e)}"
\ No newline at end of file
@@ -1,28 +1,177 @@
 import os
+import hashlib
 import aiofiles
-import aiohttp
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Union
 from fastapi import HTTPException
 import uuid
 from urllib.parse import urlparse
 
+from app.core import get_settings
+from app.services.http_clients import get_download_session
+
+settings = get_settings()
+
 DOWNLOAD_DIR = "data"
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
-async def save_file_from_url(file_url: str) -> str: 
+
+@dataclass
+class UrlValidators:
+    """HTTP cache validators of a downloaded URL."""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_length: Optional[int] = None
+
+    @classmethod
+    def from_headers(cls, headers) -> "UrlValidators":
+        length = headers.get("Content-Length")
+        return cls(
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            content_length=int(length) if length and length.isdigit() else None,
+        )
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def matches(self, other: "UrlValidators") -> bool:
+        """Whether other identifies the same bytes, for servers that ignore conditional headers."""
+        if self.etag and other.etag:
+            # Weak ETags only promise equivalent content, not identical bytes
+            return self.etag == other.etag and not self.etag.startswith("W/")
+        if self.last_modified and other.last_modified:
+            return (
+                self.last_modified == other.last_modified
+                and self.content_length is not None
+                and self.content_length == other.content_length
+            )
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"etag": self.etag, "last_modified": self.last_modified, "content_length": self.content_length}
+
+
+@dataclass
+class DownloadedDocument:
+    """
+    A downloaded document, kept in memory when small and spilled to a file in
+    DOWNLOAD_DIR otherwise.
+    """
+    filename: str
+    sha256: str
+    size: int
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+    validators: UrlValidators = field(default_factory=UrlValidators)
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """What the extractors consume: the bytes themselves, or the spill file path."""
+        return self.data if self.data is not None else self.path
+
+    def close(self):
+        self.data = None
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _filename_from_url(file_url: str) -> str:
     parsed_url = urlparse(str(file_url))
     original_filename = f"{uuid.uuid4()}_{os.path.basename(parsed_url.path)}"
     if not original_filename:
         raise HTTPException(status_code=400, detail="Could not determine filename from URL")
+    return original_filename
+
+
+def _too_large():
+    return HTTPException(
+        status_code=413,
+        detail=f"Document is larger than the {settings.max_download_bytes} byte limit"
+    )
 
-    filepath = os.path.join(DOWNLOAD_DIR, original_filename)
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(str(file_url)) as response:
+async def download_document(file_url: str, cached: Optional[UrlValidators] = None) -> Optional[DownloadedDocument]:
+    """
+    Streams a document, hashing it as bytes arrive.
+
+    Documents up to download_spool_bytes stay in memory; larger ones are
+    written to disk as they stream in. Downloads over max_download_bytes are
+    rejected with a 413.
+
+    If cached validators from an earlier download are given, the request is
+    conditional, and None is returned without reading the body when the server
+    answers 304 or returns the same validators.
+    """
+    original_filename = _filename_from_url(file_url)
+    sha256 = hashlib.sha256()
+    buffer = bytearray()
+    size = 0
+    filepath = None
+    spill = None
+
+    try:
+        headers = cached.conditional_headers() if cached else None
+        async with get_download_session().get(str(file_url), headers=headers) as response:
+            if cached and response.status == 304:
+                return None
             if response.status != 200:
                 raise HTTPException(status_code=400, detail="Failed to download file")
 
-            async with aiofiles.open(filepath, 'wb') as f:
-                await f.write(await response.read())
+            validators = UrlValidators.from_headers(response.headers)
+            if cached and cached.matches(validators):
+                return None
+
+            if response.content_length and response.content_length > settings.max_download_bytes:
+                raise _too_large()
+
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.max_download_bytes:
+                    raise _too_large()
+                sha256.update(chunk)
+
+                if spill is not None:
+                    await spill.write(chunk)
+                    continue
+
+                buffer.extend(chunk)
+                if len(buffer) > settings.download_spool_bytes:
+                    filepath = os.path.join(DOWNLOAD_DIR, original_filename)
+                    spill = await aiofiles.open(filepath, 'wb')
+                    await spill.write(bytes(buffer))
+                    buffer = bytearray()
+
+        if spill is not None:
+            await spill.close()
+            return DownloadedDocument(original_filename, sha256.hexdigest(), size, path=filepath, validators=validators)
+
+        return DownloadedDocument(original_filename, sha256.hexdigest(), size, data=bytes(buffer), validators=validators)
+    except BaseException:
+        if spill is not None:
+            await spill.close()
+        if filepath and os.path.exists(filepath):
+            os.remove(filepath)
+        raise
+
+
+async def save_file_from_url(file_url: str) -> str: 
+    original_filename = _filename_from_url(file_url)
+
+    filepath = os.path.join(DOWNLOAD_DIR, original_filename)
+
+    async with get_download_session().get(str(file_url)) as response:
+        if response.status != 200:
+            raise HTTPException(status_code=400, detail="Failed to download file")
+
+        async with aiofiles.open(filepath, 'wb') as f:
+            await f.write(await response.read())
     
-    return filepath, original_filename
\ No newline at end of file
+    return filepath, original_filename
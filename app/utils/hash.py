@@ -1,8 +1,12 @@
 import hashlib
+from app.utils.executors import run_blocking
 
-async def compute_sha256(file_path: str) -> str:
+def _sha256_file(file_path: str) -> str:
     sha256 = hashlib.sha256()
     with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
             sha256.update(chunk)
     return sha256.hexdigest()
+
+async def compute_sha256(file_path: str) -> str:
+    return await run_blocking(_sha256_file, file_path)
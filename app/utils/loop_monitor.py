@@ -0,0 +1,58 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Optional
+
+class LoopBlockMonitor:
+    """
+    Debug watchdog that flags anything holding the event loop too long.
+
+    A daemon thread schedules a no-op on the loop and waits for it. If the loop
+    doesn't run it within the threshold, the loop thread's current stack is
+    logged, which points straight at the blocking call.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, threshold: float = 0.1, interval: Optional[float] = None):
+        self.loop = loop
+        self.threshold = threshold
+        self.interval = interval if interval is not None else threshold
+        self.blocked_count = 0
+        self._loop_thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        # Must be called from the loop's own thread
+        self._loop_thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="loop-block-monitor", daemon=True)
+        self._thread.start()
+        logging.info(f"Event loop block monitor started (threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            responded = threading.Event()
+            sent_at = time.monotonic()
+            try:
+                self.loop.call_soon_threadsafe(responded.set)
+            except RuntimeError:
+                return  # loop closed
+
+            if not responded.wait(self.threshold):
+                self.blocked_count += 1
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = "".join(traceback.format_stack(frame)) if frame else "<unavailable>"
+                logging.warning(f"Event loop blocked for more than {self.threshold * 1000:.0f}ms in:\n{stack}")
+
+                while not responded.wait(1) and not self._stopped.is_set():
+                    pass
+                logging.warning(f"Event loop was blocked for {time.monotonic() - sent_at:.3f}s")
+
+            self._stopped.wait(self.interval)
@@ -0,0 +1,61 @@
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+_current: ContextVar[Optional["StageTimeline"]] = ContextVar("stage_timeline", default=None)
+
+class StageTimeline:
+    """
+    Start and end times of the stages of one request, relative to its start.
+
+    Stages may overlap; the log shows one bar per stage, so concurrent stages
+    are easy to spot. Code deeper in the call tree records into the request's
+    timeline through stage(), without it being passed around.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.monotonic()
+        self.stages: Dict[str, List[Optional[float]]] = {}
+
+    def activate(self):
+        """Makes this the timeline stage() records into, for this task and tasks it creates."""
+        _current.set(self)
+
+    def start(self, name: str):
+        self.stages.setdefault(name, [time.monotonic() - self.started_at, None])
+
+    def end(self, name: str):
+        if name in self.stages:
+            self.stages[name][1] = time.monotonic() - self.started_at
+
+    def render(self, width: int = 40) -> str:
+        total = max([end or 0 for _, end in self.stages.values()] + [time.monotonic() - self.started_at])
+        lines = [f"Timeline of {self.name} ({total:.2f}s):"]
+        for name, (start, end) in sorted(self.stages.items(), key=lambda item: item[1][0]):
+            stop = end if end is not None else total
+            first = int(start / total * width) if total else 0
+            length = max(1, int((stop - start) / total * width)) if total else 1
+            bar = " " * first + "#" * length
+            status = f"{stop - start:6.2f}s" if end is not None else "running"
+            lines.append(f"  {name:<20} {start:6.2f}s {bar:<{width}} {status}")
+        return "\n".join(lines)
+
+    def log(self):
+        logging.info(self.render())
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Records the enclosed block as a stage of the current request's timeline, if there is one."""
+    timeline = _current.get()
+    if timeline is None:
+        yield
+        return
+
+    timeline.start(name)
+    try:
+        yield
+    finally:
+        timeline.end(name)
@@ -0,0 +1,91 @@
+"""
+Reports recall and latency of the HNSW index against exact search.
+
+Builds an index over synthetic clustered vectors (clusters stand in for
+documents, which embed close together). It then answers the same queries
+exactly, with one matrix-vector product, and through the index at several
+ef_search values, and prints recall@k and per-query latency for each.
+
+Usage:
+    python benchmarks/ann_recall.py [--vectors 100000] [--dimensions 1536] [--queries 200]
+        [--k 10] [--m 32] [--ef-construction 200] [--ef 16,32,64,128,256]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ann_index import HnswIndex
+
+def normalized(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+def synthetic_vectors(count: int, dimensions: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dimensions), dtype=np.float32)
+    assignment = rng.integers(0, clusters, size=count)
+    noise = rng.standard_normal((count, dimensions), dtype=np.float32) * 0.6
+    return normalized(centers[assignment] + noise).astype(np.float32)
+
+def percentile_ms(latencies, q: float) -> float:
+    return float(np.percentile(latencies, q) * 1000)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef", default="16,32,64,128,256")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    clusters = max(1, args.vectors // 500)
+    vectors = synthetic_vectors(args.vectors, args.dimensions, clusters, rng)
+    queries = synthetic_vectors(args.queries, args.dimensions, clusters, rng)
+
+    latencies = []
+    exact = []
+    for query in queries:
+        started = time.perf_counter()
+        scores = vectors @ query
+        top = np.argpartition(-scores, args.k - 1)[:args.k]
+        latencies.append(time.perf_counter() - started)
+        exact.append(set(top.tolist()))
+    print(f"exact scan: p50 {percentile_ms(latencies, 50):.2f} ms, p95 {percentile_ms(latencies, 95):.2f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = HnswIndex(
+            directory,
+            args.dimensions,
+            m=args.m,
+            ef_construction=args.ef_construction,
+            initial_capacity=args.vectors,
+        )
+        started = time.perf_counter()
+        index.add([("synthetic", i) for i in range(args.vectors)], vectors)
+        print(f"built index over {args.vectors} vectors in {time.perf_counter() - started:.1f}s")
+
+        print(f"{'ef':>6} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+        for ef in [int(value) for value in args.ef.split(",")]:
+            index.ef_search = ef
+            latencies = []
+            found = 0
+            for query, expected in zip(queries, exact):
+                started = time.perf_counter()
+                results = index.search(query, args.k)
+                latencies.append(time.perf_counter() - started)
+                found += len(expected & {chunk_number for (_, chunk_number), _ in results})
+            recall = found / (args.k * len(queries))
+            print(f"{ef:>6} {recall:>10.3f} {percentile_ms(latencies, 50):>8.2f} {percentile_ms(latencies, 95):>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Reports the memory a batch of knowledge-graph chunks takes as ChunkCollection
+views against the dataclass-per-chunk representation it replaced.
+
+The previous DocumentChunk held a copy of its text and its own copy of the
+document metadata. A ChunkCollection keeps offsets and token counts in typed
+arrays and the metadata once, and slices text from the source on access.
+The source document itself is allocated before measuring, as both share it.
+
+Usage:
+    python benchmarks/chunk_memory.py [--chunks 200000] [--chunk-chars 500]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "kg"))
+
+from chunker import ChunkCollection
+
+@dataclass
+class LegacyDocumentChunk:
+    content: str
+    index: int
+    start_char: int
+    end_char: int
+    metadata: Dict[str, Any]
+    token_count: Optional[int] = None
+
+    def __post_init__(self):
+        if self.token_count is None:
+            self.token_count = len(self.content) // 4
+
+BASE_METADATA = {
+    "title": "Global Health Care Policy Wordings",
+    "source": "policies/global-health-care.pdf",
+    "insurer": "Example General Insurance",
+    "document_type": "health_insurance_policy",
+    "chunk_method": "semantic",
+}
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--chunk-chars", type=int, default=500)
+    args = parser.parse_args()
+
+    sentence = "The insured shall be indemnified for reasonable and customary charges. "
+    chunk_text = (sentence * (args.chunk_chars // len(sentence) + 1))[:args.chunk_chars - 2] + "\n\n"
+    source = chunk_text * args.chunks
+    spans = [(i * len(chunk_text), i * len(chunk_text) + args.chunk_chars - 2) for i in range(args.chunks)]
+
+    def legacy():
+        return [
+            LegacyDocumentChunk(
+                content=source[start:end],
+                index=index,
+                start_char=start,
+                end_char=end,
+                metadata={**BASE_METADATA, "total_chunks": len(spans)},
+            )
+            for index, (start, end) in enumerate(spans)
+        ]
+
+    def compact():
+        chunks = ChunkCollection(source, {**BASE_METADATA, "total_chunks": len(spans)})
+        for start, end in spans:
+            chunks.append(start, end)
+        return chunks
+
+    legacy_bytes = measure(legacy)
+    compact_bytes = measure(compact)
+    text_bytes = sum(sys.getsizeof(source[start:end]) for start, end in spans[:1000]) * len(spans) // min(len(spans), 1000)
+
+    print(f"{args.chunks} chunks of {args.chunk_chars} characters (source {len(source) / 1e6:.0f} MB, not counted)")
+    print(f"{'representation':>16} {'MB':>9} {'bytes/chunk':>12}")
+    print(f"{'dataclass':>16} {legacy_bytes / 1e6:>9.1f} {legacy_bytes / args.chunks:>12.0f}")
+    print(f"{'  without text':>16} {(legacy_bytes - text_bytes) / 1e6:>9.1f} {(legacy_bytes - text_bytes) / args.chunks:>12.0f}")
+    print(f"{'ChunkCollection':>16} {compact_bytes / 1e6:>9.1f} {compact_bytes / args.chunks:>12.0f}")
+    print(f"reduction: {legacy_bytes / compact_bytes:.0f}x ({(legacy_bytes - text_bytes) / compact_bytes:.0f}x excluding chunk text)")
+
+if __name__ == "__main__":
+    main()
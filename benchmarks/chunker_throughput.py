@@ -0,0 +1,150 @@
+"""
+Reports chunking throughput of token_chunking against the implementation it
+replaced, on synthetic documents of 10-100 MB.
+
+The previous implementation decoded every 1500-token window, scanned it
+with several rfind calls for a boundary, and started the next window from
+the uncut window end, dropping whatever the boundary cut off. For both, this
+prints MB/s, chunk count and how many non-whitespace characters of the input
+appear in no chunk.
+
+Usage:
+    python benchmarks/chunker_throughput.py [--sizes 10,50,100] [--max-tokens 1500] [--overlap 50]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chunker import chunk_spans, get_encoding
+
+def legacy_find_smart_boundary(chunk_text: str) -> str:
+    if '\n\n' in chunk_text:
+        last_paragraph = chunk_text.rfind('\n\n')
+        if last_paragraph > len(chunk_text) * 0.3:
+            return chunk_text[:last_paragraph].strip()
+
+    sentence_endings = ['. ', '! ', '? ', '.\n', '!\n', '?\n']
+    best_sentence_end = -1
+
+    for ending in sentence_endings:
+        pos = chunk_text.rfind(ending)
+        if pos > best_sentence_end and pos > len(chunk_text) * 0.3:
+            best_sentence_end = pos + len(ending) - 1
+
+    if best_sentence_end > -1:
+        return chunk_text[:best_sentence_end + 1].strip()
+
+    last_space = chunk_text.rfind(' ')
+    if last_space > len(chunk_text) * 0.3:
+        return chunk_text[:last_space].strip()
+
+    return chunk_text.strip()
+
+def legacy_token_chunking(text: str, max_tokens: int = 1500, overlap_tokens: int = 50) -> List[str]:
+    if not text.strip():
+        return []
+
+    encoding = get_encoding()
+    tokens = encoding.encode(text)
+
+    if len(tokens) <= max_tokens:
+        return [text.strip()]
+
+    chunks = []
+    start_idx = 0
+
+    while start_idx < len(tokens):
+        end_idx = min(start_idx + max_tokens, len(tokens))
+
+        chunk = encoding.decode(tokens[start_idx:end_idx])
+        if end_idx < len(tokens):
+            chunk = legacy_find_smart_boundary(chunk)
+
+        chunk = chunk.strip()
+        if chunk:
+            chunks.append(chunk)
+
+        if end_idx >= len(tokens):
+            break
+
+        overlap_start = max(0, end_idx - overlap_tokens)
+        start_idx = overlap_start if overlap_start > start_idx else end_idx
+
+    return chunks
+
+WORDS = (
+    "policy insured premium claim hospital benefit coverage period waiting exclusion "
+    "treatment sum limit room rent deductible renewal grace notice section clause "
+    "the of and to in a is for shall be by with any or as per under such"
+).split()
+
+def synthetic_text(megabytes: int, rng: random.Random) -> str:
+    """Paragraphs of sentences of policy-like words, built from a few distinct blocks."""
+    blocks = []
+    for _ in range(8):
+        paragraphs = []
+        size = 0
+        while size < 1024 * 1024:
+            sentences = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))).capitalize() + rng.choice(".!?")
+                for _ in range(rng.randint(1, 8))
+            ]
+            paragraph = " ".join(sentences)
+            paragraphs.append(paragraph)
+            size += len(paragraph) + 2
+        blocks.append("\n\n".join(paragraphs))
+    return "\n\n".join(blocks[i % len(blocks)] for i in range(megabytes))
+
+def uncovered_characters(text: str, chunks: List[str]) -> int:
+    """Non-whitespace characters of text outside every chunk, locating chunks in order."""
+    covered_to = 0
+    missing = 0
+    position = 0
+    for chunk in chunks:
+        found = text.find(chunk, position)
+        if found < 0:
+            continue
+        if found > covered_to:
+            missing += sum(1 for c in text[covered_to:found] if not c.isspace())
+        covered_to = max(covered_to, found + len(chunk))
+        position = found + 1
+    missing += sum(1 for c in text[covered_to:] if not c.isspace())
+    return missing
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,50,100", help="Document sizes in MB")
+    parser.add_argument("--max-tokens", type=int, default=1500)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    chunk_spans("warm up the tokenizer and its offset tables")
+
+    print(f"{'MB':>5} {'implementation':>15} {'seconds':>8} {'MB/s':>7} {'chunks':>7} {'uncovered':>10}")
+    for megabytes in [int(size) for size in args.sizes.split(",")]:
+        text = synthetic_text(megabytes, rng)
+        size_mb = len(text.encode()) / (1024 * 1024)
+
+        started = time.perf_counter()
+        legacy = legacy_token_chunking(text, args.max_tokens, args.overlap)
+        elapsed = time.perf_counter() - started
+        print(f"{megabytes:>5} {'legacy':>15} {elapsed:>8.2f} {size_mb / elapsed:>7.2f} {len(legacy):>7} "
+              f"{uncovered_characters(text, legacy):>10}")
+
+        started = time.perf_counter()
+        spans = chunk_spans(text, args.max_tokens, args.overlap)
+        elapsed = time.perf_counter() - started
+        chunks = [text[span.start:span.end] for span in spans]
+        print(f"{megabytes:>5} {'spans':>15} {elapsed:>8.2f} {size_mb / elapsed:>7.2f} {len(spans):>7} "
+              f"{uncovered_characters(text, chunks):>10}")
+
+if __name__ == "__main__":
+    main()
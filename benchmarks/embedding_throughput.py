@@ -0,0 +1,80 @@
+"""
+Measures BatchEmbedder throughput in chunks per second.
+
+By default it calls the configured embedding API. With --fake it uses an
+in-process client that sleeps --fake-latency seconds per request, which
+isolates packing and concurrency from network and quota effects.
+
+Usage:
+    python benchmarks/embedding_throughput.py [--chunks 400] [--chunk-tokens 1500]
+        [--batch-items 100] [--batch-tokens 20000] [--in-flight 4] [--fake] [--fake-latency 0.4]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import get_settings
+from app.services.embeddings import BatchEmbedder
+
+WORDS = "policy insured hospitalisation benefit waiting period exclusion claim premium cover".split()
+
+def synthetic_chunks(count: int, tokens: int):
+    # Roughly one token per word for these words
+    return [
+        " ".join(WORDS[(i + j) % len(WORDS)] for j in range(tokens)) + f" {i}"
+        for i in range(count)
+    ]
+
+class FakeEmbeddings:
+    def __init__(self, latency: float, dimensions: int):
+        self.latency = latency
+        self.dimensions = dimensions
+
+    async def create(self, model, dimensions, input):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=[0.0] * dimensions) for i in range(len(input))
+        ])
+
+async def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--chunk-tokens", type=int, default=1500)
+    parser.add_argument("--batch-items", type=int, default=settings.embedding_batch_items)
+    parser.add_argument("--batch-tokens", type=int, default=settings.embedding_batch_tokens)
+    parser.add_argument("--in-flight", type=int, default=settings.embedding_max_in_flight)
+    parser.add_argument("--fake", action="store_true")
+    parser.add_argument("--fake-latency", type=float, default=0.4)
+    args = parser.parse_args()
+
+    if args.fake:
+        fake_client = SimpleNamespace(embeddings=FakeEmbeddings(args.fake_latency, settings.embedding_dimensions))
+        client_factory = lambda: fake_client
+    else:
+        from app.services.vector_store_service import get_openai_client
+        client_factory = get_openai_client
+
+    embedder = BatchEmbedder(
+        client_factory=client_factory,
+        model=settings.embedding_model,
+        dimensions=settings.embedding_dimensions,
+        max_batch_items=args.batch_items,
+        max_batch_tokens=args.batch_tokens,
+        max_in_flight=args.in_flight,
+    )
+
+    chunks = synthetic_chunks(args.chunks, args.chunk_tokens)
+    await embedder.embed_many(chunks)
+
+    stats = embedder.last_run
+    print(f"{stats.items} chunks, {stats.batches} batches, {stats.requests} requests, {stats.retried_items} retried items")
+    print(f"{stats.seconds:.2f}s -> {stats.chunks_per_second:.1f} chunks/s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""
+Measures the cold-start import time of the API.
+
+Each run imports the module in a fresh interpreter, so nothing is cached
+between runs. Prints the wall-clock import time and the slowest imports
+reported by `python -X importtime`.
+
+Usage:
+    python benchmarks/import_time.py [--module app.main] [--runs 5] [--top 15] [--max-seconds 1.0]
+
+Exits with status 1 if the median exceeds --max-seconds, so it can gate CI.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def run_once(module: str):
+    code = (
+        "import time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - started)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Importing {module} failed")
+
+    seconds = float(result.stdout.strip().splitlines()[-1])
+
+    # Only top-level entries: their cumulative time includes everything they pulled in
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            imports.append((int(match.group(2)) / 1e6, match.group(4)))
+
+    return seconds, imports
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    timings = []
+    slowest = []
+    for _ in range(args.runs):
+        seconds, imports = run_once(args.module)
+        timings.append(seconds)
+        slowest = imports
+
+    median = statistics.median(timings)
+    print(f"import {args.module}: median {median:.3f}s, min {min(timings):.3f}s, max {max(timings):.3f}s over {args.runs} runs")
+    print("\nSlowest top-level imports (last run):")
+    for seconds, name in sorted(slowest, reverse=True)[:args.top]:
+        print(f"  {seconds:8.3f}s  {name}")
+
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f"\nFAIL: median import time {median:.3f}s exceeds {args.max_seconds:.3f}s")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()